@@ -0,0 +1,176 @@
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from typing import Dict, Optional
+
+from fastapi import HTTPException, status
+
+# =========================
+# CONFIG
+# =========================
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", str(HASH_WORKERS * 4)))
+HASH_QUEUE_TIMEOUT = float(os.getenv("HASH_QUEUE_TIMEOUT", "2"))
+HASH_TIMEOUT = float(os.getenv("HASH_TIMEOUT", "10"))
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    # built on first use (and once per pool worker) to keep passlib off the cold-start path
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=BCRYPT_ROUNDS,
+    )
+
+
+# =========================
+# WORKER FUNCTIONS
+# =========================
+# Run inside the process pool, so they must stay module-level and picklable.
+
+def _init_worker() -> None:
+    # forked workers inherit uvicorn's SIGTERM handler, which only flags the
+    # (absent) server to exit; restore the default so a stop signal ends them
+    # and they release the inherited listening socket
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _hash(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return get_pwd_context().verify(password, hashed)
+
+
+# =========================
+# POOL
+# =========================
+
+class HashStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ops: Dict[str, Dict[str, float]] = {}
+        self.rejected = 0
+
+    def record(self, op: str, wait: float, run: float) -> None:
+        with self._lock:
+            entry = self.ops.setdefault(
+                op,
+                {"count": 0, "wait_total": 0.0, "run_total": 0.0, "run_max": 0.0},
+            )
+            entry["count"] += 1
+            entry["wait_total"] += wait
+            entry["run_total"] += run
+            entry["run_max"] = max(entry["run_max"], run)
+
+    def reject(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            ops = {}
+            for op, entry in self.ops.items():
+                count = entry["count"] or 1
+                ops[op] = {
+                    "count": int(entry["count"]),
+                    "avg_wait_ms": entry["wait_total"] / count * 1000,
+                    "avg_run_ms": entry["run_total"] / count * 1000,
+                    "max_run_ms": entry["run_max"] * 1000,
+                }
+            return {
+                "workers": HASH_WORKERS,
+                "queue_size": HASH_QUEUE_SIZE,
+                "bcrypt_rounds": BCRYPT_ROUNDS,
+                "rejected": self.rejected,
+                "ops": ops,
+            }
+
+
+class HashPool:
+    """Bounded process pool for bcrypt so hashing uses every core, not just the GIL holder."""
+
+    def __init__(self, workers: int = HASH_WORKERS, queue_size: int = HASH_QUEUE_SIZE):
+        self.workers = workers
+        # slots = running + waiting; callers beyond that are rejected instead of piling up
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.stats = HashStats()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def run(self, op: str, fn, *args):
+        queued_at = time.perf_counter()
+
+        if not self._slots.acquire(timeout=HASH_QUEUE_TIMEOUT):
+            self.stats.reject()
+            raise HTTPException(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "Authentication is busy, try again",
+            )
+
+        try:
+            future = self._get_executor().submit(fn, *args)
+            started_at = time.perf_counter()
+            try:
+                result = future.result(timeout=HASH_TIMEOUT)
+            except FutureTimeoutError:
+                future.cancel()
+                raise HTTPException(
+                    status.HTTP_503_SERVICE_UNAVAILABLE,
+                    "Authentication timed out",
+                )
+            # wait covers only the semaphore; pool queueing shows up in run time
+            self.stats.record(
+                op,
+                wait=started_at - queued_at,
+                run=time.perf_counter() - started_at,
+            )
+            return result
+        finally:
+            self._slots.release()
+
+
+hash_pool = HashPool()
+
+
+# =========================
+# PUBLIC HELPERS
+# =========================
+
+def hash_password(password: str) -> str:
+    return hash_pool.run("hash", _hash, password)
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    return hash_pool.run("verify", _verify, password, hashed)
+
+
+def needs_rehash(hashed: str) -> bool:
+    # True when the stored hash uses a different cost than BCRYPT_ROUNDS
+    return get_pwd_context().needs_update(hashed)
@@ -1,28 +1,54 @@
-from fastapi import FastAPI, Depends, HTTPException
+from contextlib import asynccontextmanager
+
+from typing import List, Optional
+
+from fastapi import FastAPI, Depends, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
 import jwt
 import os
 
+from admission import ADMISSION_ENABLED, AdmissionController, AdmissionMiddleware, AdmissionRule
 import models
 import schemas
-from database import Base, engine
-from deps import get_db
+from database import async_engine, engine, require_engine
+from deps import Database, get_db
+from hashing import HASH_WORKERS, hash_password, hash_pool, needs_rehash, verify_password
+from metrics import METRICS_ENABLED, MetricsMiddleware, instrument_engine, metrics_response, register_stats
+from migrations import MIGRATIONS
+from schema import migrate
+from startup import FirstRequestMiddleware, StartupReport
+from user_cache import user_cache
 
 # =========================
 # APP INIT
 # =========================
 
+startup_report = StartupReport("auth-service")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db_engine = require_engine()
+    with startup_report.phase("schema"):
+        startup_report.schema_from, startup_report.schema_to = migrate(db_engine, MIGRATIONS)
+    startup_report.ready()
+
+    try:
+        yield
+    finally:
+        hash_pool.shutdown()
+
+
 app = FastAPI(
     title="Bike4You AuthService",
     version="2.0.0",
     swagger_ui_parameters={"persistAuthorization": True},
+    lifespan=lifespan,
 )
 
-Base.metadata.create_all(bind=engine)
-
 # =========================
 # CONFIG
 # =========================
@@ -31,9 +57,44 @@ SECRET_KEY = os.getenv("SECRET_KEY", "SUPER_SECRET_KEY_CHANGE_ME")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 KAMK_DOMAIN = "@kamk.fi"
 
+USERS_BATCH_MAX_IDS = int(os.getenv("USERS_BATCH_MAX_IDS", "500"))
+
+# bcrypt routes: enough in flight to keep the hash pool busy, no more
+PASSWORD_CONCURRENCY = int(os.getenv("PASSWORD_CONCURRENCY", str(HASH_WORKERS * 2)))
+PASSWORD_QUEUE_SIZE = int(os.getenv("PASSWORD_QUEUE_SIZE", "32"))
+LOGIN_RATE_PER_MINUTE = float(os.getenv("LOGIN_RATE_PER_MINUTE", "10"))
+LOGIN_BURST = int(os.getenv("LOGIN_BURST", "5"))
+
+# optional so /auth/me can still fall back to the legacy ?token= parameter
+bearer = HTTPBearer(auto_error=False)
+
+# =========================
+# ADMISSION CONTROL
+# =========================
+# added before CORS so shed responses still carry CORS headers
+
+admission = AdmissionController([
+    AdmissionRule(
+        "login",
+        [("POST", "/auth/login")],
+        concurrency=PASSWORD_CONCURRENCY,
+        queue_size=PASSWORD_QUEUE_SIZE,
+        rate=LOGIN_RATE_PER_MINUTE / 60,
+        burst=LOGIN_BURST,
+    ),
+    AdmissionRule(
+        "register",
+        [("POST", "/auth/register")],
+        concurrency=PASSWORD_CONCURRENCY,
+        queue_size=PASSWORD_QUEUE_SIZE,
+    ),
+])
+
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, controller=admission)
+
 # =========================
 # CORS (🔥 FIXED 🔥)
 # =========================
@@ -54,16 +115,34 @@ app.add_middleware(
 )
 
 # =========================
-# HELPERS
+# METRICS
 # =========================
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+def hashing_counters() -> dict:
+    snapshot = hash_pool.stats.snapshot()
+    counters = {"rejected": snapshot["rejected"]}
+    for op, entry in snapshot["ops"].items():
+        for key, value in entry.items():
+            counters[f"{op}_{key}"] = value
+    return counters
 
 
-def verify_password(password: str, hashed: str) -> bool:
-    return pwd_context.verify(password, hashed)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    if engine is not None:
+        instrument_engine(engine)
+    if async_engine is not None:
+        instrument_engine(async_engine.sync_engine)
+    register_stats("hashing", hashing_counters)
+    register_stats("user_cache", user_cache.stats)
+    register_stats("admission", admission.stats)
+    register_stats("startup", startup_report.stats)
 
+app.add_middleware(FirstRequestMiddleware, report=startup_report)
+
+# =========================
+# HELPERS
+# =========================
 
 def create_access_token(user_id: int, role: str) -> str:
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -74,32 +153,80 @@ def create_access_token(user_id: int, role: str) -> str:
     }
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
+
+def decode_token(token: str) -> dict:
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Invalid token")
+
+
+def get_admin_payload(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer),
+) -> dict:
+    if credentials is None:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Not authenticated")
+
+    payload = decode_token(credentials.credentials)
+    if payload.get("role") != "admin":
+        raise HTTPException(status.HTTP_403_FORBIDDEN, "Admin privileges required")
+    return payload
+
+
+def parse_ids(raw: str) -> List[int]:
+    try:
+        ids = [int(part) for part in raw.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(422, "ids must be a comma-separated list of integers")
+
+    if len(ids) > USERS_BATCH_MAX_IDS:
+        raise HTTPException(422, f"At most {USERS_BATCH_MAX_IDS} ids per request")
+
+    # keep the caller's order, drop duplicates
+    return list(dict.fromkeys(ids))
+
+
+async def load_user(user_id: int, db: Database) -> Optional[schemas.UserOut]:
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    user = await db.run(
+        lambda s: s.query(models.User).filter(
+            models.User.id == user_id
+        ).first()
+    )
+    return user_cache.put(user) if user else None
+
 # =========================
 # ENDPOINTS
 # =========================
 
 @app.post("/auth/register", response_model=schemas.Token)
-def register(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user_in: schemas.UserCreate, db: Database = Depends(get_db)):
 
     if not user_in.email.endswith(KAMK_DOMAIN):
         raise HTTPException(400, "Email must end with @kamk.fi")
 
-    existing = db.query(models.User).filter(
-        models.User.email == user_in.email
-    ).first()
+    existing = await db.run(
+        lambda s: s.query(models.User).filter(
+            models.User.email == user_in.email
+        ).first()
+    )
     if existing:
         raise HTTPException(400, "User already exists")
 
     user = models.User(
         name=user_in.name,
         email=user_in.email,
-        hashed_password=hash_password(user_in.password),
+        hashed_password=await run_in_threadpool(hash_password, user_in.password),
         role="user",
     )
 
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    user_cache.invalidate(user.id)
 
     token = create_access_token(user.id, user.role)
 
@@ -111,17 +238,26 @@ def register(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
 
 
 @app.post("/auth/login", response_model=schemas.Token)
-def login(data: schemas.LoginRequest, db: Session = Depends(get_db)):
+async def login(data: schemas.LoginRequest, db: Database = Depends(get_db)):
 
-    user = db.query(models.User).filter(
-        models.User.email == data.email
-    ).first()
+    user = await db.run(
+        lambda s: s.query(models.User).filter(
+            models.User.email == data.email
+        ).first()
+    )
     if not user:
         raise HTTPException(404, "User not found")
 
-    if not verify_password(data.password, user.hashed_password):
+    # bcrypt blocks while it waits on the process pool, keep it off the event loop
+    if not await run_in_threadpool(verify_password, data.password, user.hashed_password):
         raise HTTPException(400, "Incorrect password")
 
+    # BCRYPT_ROUNDS changed since this hash was stored: upgrade it transparently
+    if needs_rehash(user.hashed_password):
+        user.hashed_password = await run_in_threadpool(hash_password, data.password)
+        await db.commit()
+        await db.refresh(user)
+
     token = create_access_token(user.id, user.role)
 
     return schemas.Token(
@@ -132,18 +268,88 @@ def login(data: schemas.LoginRequest, db: Session = Depends(get_db)):
 
 
 @app.get("/auth/me", response_model=schemas.UserOut)
-def get_me(token: str, db: Session = Depends(get_db)):
+async def get_me(
+    token: Optional[str] = Query(default=None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer),
+    db: Database = Depends(get_db),
+):
+    # the Authorization header wins; ?token= is kept for existing clients
+    if credentials is not None:
+        token = credentials.credentials
+    if not token:
+        raise HTTPException(401, "Not authenticated")
+
+    payload = decode_token(token)
+    user = await load_user(int(payload["sub"]), db)
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    except jwt.PyJWTError:
-        raise HTTPException(401, "Invalid token")
+    if not user:
+        raise HTTPException(404, "User not found")
 
-    user = db.query(models.User).filter(
-        models.User.id == int(payload["sub"])
-    ).first()
+    return user
 
+
+@app.get("/auth/users", response_model=schemas.UserBatch)
+async def get_users(
+    ids: str = Query(..., description="Comma-separated user ids"),
+    db: Database = Depends(get_db),
+    admin: dict = Depends(get_admin_payload),
+):
+    wanted = parse_ids(ids)
+    found = user_cache.get_many(wanted)
+
+    missing = [i for i in wanted if i not in found]
+    if missing:
+        rows = await db.run(
+            lambda s: s.query(models.User).filter(
+                models.User.id.in_(missing)
+            ).all()
+        )
+        for user in rows:
+            found[user.id] = user_cache.put(user)
+
+    return {
+        "items": [found[i] for i in wanted if i in found],
+        "missing": [i for i in wanted if i not in found],
+    }
+
+
+@app.put("/auth/users/{user_id}/role", response_model=schemas.UserOut)
+async def set_user_role(
+    user_id: int,
+    data: schemas.RoleUpdate,
+    db: Database = Depends(get_db),
+    admin: dict = Depends(get_admin_payload),
+):
+    user = await db.run(
+        lambda s: s.query(models.User).filter(
+            models.User.id == user_id
+        ).first()
+    )
     if not user:
         raise HTTPException(404, "User not found")
 
+    user.role = data.role
+    await db.commit()
+    await db.refresh(user)
+    # tokens already issued keep their old role claim until they expire
+    user_cache.invalidate(user_id)
+
     return user
+
+
+@app.get("/auth/hashing/stats")
+def hashing_stats(admin: dict = Depends(get_admin_payload)):
+    return hash_pool.stats.snapshot()
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return metrics_response()
+
+
+@app.get("/health/startup", include_in_schema=False)
+def startup_health():
+    return startup_report.as_dict()
+
+
+startup_report.mark("imported")
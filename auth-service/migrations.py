@@ -0,0 +1,14 @@
+# models must be imported so their tables are registered on Base
+import models  # noqa: F401
+from database import Base
+from schema import Migration
+
+
+def create_tables(conn) -> None:
+    # creates whatever is missing from the current models; existing tables are left alone
+    Base.metadata.create_all(bind=conn)
+
+
+MIGRATIONS = [
+    Migration(1, "create tables", create_tables),
+]
@@ -0,0 +1,82 @@
+import logging
+from typing import Callable, List, NamedTuple, Tuple
+
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+logger = logging.getLogger("uvicorn.error")
+
+# arbitrary key for pg_advisory_xact_lock, so parallel instances migrate one at a time
+MIGRATION_LOCK_KEY = 4_211_007
+
+# kept out of Base.metadata so the models never create or drop it
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+# --------------------------
+# HELPERS FOR MIGRATIONS
+# --------------------------
+# Databases created before versioning already have some of these changes,
+# so every step must be safe to run against a schema that has them.
+
+def add_column(conn: Connection, table: str, name: str, ddl: str) -> None:
+    columns = {c["name"] for c in inspect(conn).get_columns(table)}
+    if name not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+
+def create_indexes(conn: Connection, table) -> None:
+    for index in table.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+
+# --------------------------
+# BOOTSTRAP
+# --------------------------
+
+def current_version(engine: Engine) -> int:
+    # the one query a started-up-to-date service pays
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(schema_version.c.version)).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        return 0  # no schema_version table yet
+
+
+def migrate(engine: Engine, migrations: List[Migration]) -> Tuple[int, int]:
+    """Bring the schema up to the newest migration; returns (from, to) versions."""
+    latest = migrations[-1].version
+    found = current_version(engine)
+    if found >= latest:
+        return found, found
+
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+        schema_version.create(bind=conn, checkfirst=True)
+        # re-read under the lock: another instance may have migrated meanwhile
+        found = conn.execute(select(schema_version.c.version)).scalar() or 0
+
+        for migration in migrations:
+            if migration.version <= found:
+                continue
+            logger.info("schema: applying %s %s", migration.version, migration.name)
+            migration.apply(conn)
+
+        if found < latest:
+            conn.execute(schema_version.delete())
+            conn.execute(schema_version.insert().values(version=latest))
+
+    return found, max(found, latest)
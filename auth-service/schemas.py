@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, ConfigDict
-from typing import Optional
+from typing import List, Literal, Optional
 
 
 class UserBase(BaseModel):
@@ -29,3 +29,12 @@ class Token(BaseModel):
     user: UserOut
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class UserBatch(BaseModel):
+    items: List[UserOut]
+    missing: List[int]
+
+
+class RoleUpdate(BaseModel):
+    role: Literal["user", "admin"]
@@ -0,0 +1,97 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def _process_started() -> float:
+    # interpreter start, so import time is included; Linux only, else "now"
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return time.time()
+    return time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+class StartupReport:
+    """Milestones since process start: imports done, schema ready, first request."""
+
+    def __init__(self, service: str):
+        self.service = service
+        self.started = _process_started()
+        self.marks: Dict[str, float] = {}
+        self.phases: Dict[str, float] = {}
+        self.schema_from: Optional[int] = None
+        self.schema_to: Optional[int] = None
+
+    def _since_start(self) -> float:
+        return round((time.time() - self.started) * 1000, 1)
+
+    def mark(self, name: str) -> None:
+        self.marks.setdefault(name, self._since_start())
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def ready(self) -> None:
+        self.mark("ready")
+        logger.info(
+            "startup: service=%s imported=%sms ready=%sms phases=%s schema=%s->%s",
+            self.service,
+            self.marks.get("imported"),
+            self.marks["ready"],
+            self.phases,
+            self.schema_from,
+            self.schema_to,
+        )
+
+    def first_request(self) -> None:
+        if "first_request" in self.marks:
+            return
+        self.mark("first_request")
+        logger.info(
+            "startup: service=%s first request at %sms",
+            self.service,
+            self.marks["first_request"],
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "service": self.service,
+            "imported_ms": self.marks.get("imported"),
+            "ready_ms": self.marks.get("ready"),
+            "first_request_ms": self.marks.get("first_request"),
+            "phases_ms": dict(self.phases),
+            "schema_version_from": self.schema_from,
+            "schema_version": self.schema_to,
+        }
+
+    def stats(self) -> dict:
+        # flat numbers for the /metrics collector
+        stats = {f"{name}_ms": value for name, value in self.marks.items()}
+        stats.update({f"{name}_phase_ms": value for name, value in self.phases.items()})
+        return stats
+
+
+class FirstRequestMiddleware:
+    """Records when the first HTTP request arrives, then just passes through."""
+
+    def __init__(self, app, report: StartupReport):
+        self.app = app
+        self.report = report
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and "first_request" not in self.report.marks:
+            self.report.first_request()
+        await self.app(scope, receive, send)
@@ -0,0 +1,82 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+import schemas
+
+# =========================
+# CONFIG
+# =========================
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+# bounds staleness when another instance changed a role this one never saw
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+
+
+# =========================
+# CACHE
+# =========================
+
+class UserCache:
+    """Bounded LRU of public user records keyed by id.
+
+    Holds `UserOut` snapshots rather than ORM objects, so nothing cached is
+    tied to a session. Register and role changes invalidate their user.
+    Only touched from the event loop, so no locking.
+    """
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[schemas.UserOut, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[schemas.UserOut]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[0]
+
+    def get_many(self, user_ids: Iterable[int]) -> Dict[int, schemas.UserOut]:
+        found = {}
+        for user_id in user_ids:
+            user = self.get(user_id)
+            if user is not None:
+                found[user_id] = user
+        return found
+
+    def put(self, user) -> schemas.UserOut:
+        out = schemas.UserOut.model_validate(user, from_attributes=True)
+        if self.maxsize <= 0:
+            return out
+
+        self._entries[out.id] = (out, time.monotonic() + self.ttl)
+        self._entries.move_to_end(out.id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return out
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+user_cache = UserCache()
@@ -0,0 +1,107 @@
+"""Tail latency under overload, with and without admission control.
+
+Drives a stand-in route that holds a "worker" (an asyncio.Semaphore sized
+like a saturated upstream) for SERVICE_MS, with OFFERED times its capacity
+in concurrent clients. Without admission every request queues behind the
+semaphore; with it, requests beyond the gate's queue or deadline get a
+fast 503, back off for BACKOFF_MS, and the admitted ones keep a bounded p99.
+
+Usage:
+    python benchmarks/admission_overload_bench.py [service] [requests]
+"""
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+service = sys.argv[1] if len(sys.argv) > 1 else "rental-service"
+requests = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+
+WORKERS = int(os.getenv("WORKERS", "8"))
+SERVICE_MS = float(os.getenv("SERVICE_MS", "20"))
+OFFERED = int(os.getenv("OFFERED", "8"))  # concurrent clients per worker
+QUEUE_TIMEOUT = float(os.getenv("QUEUE_TIMEOUT", "0.2"))
+# shed clients back off before retrying; Retry-After scaled down to bench time
+BACKOFF_MS = float(os.getenv("BACKOFF_MS", "100"))
+
+sys.path.insert(0, os.path.join(ROOT, service))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+import admission  # noqa: E402
+
+
+def build_app(controller=None) -> FastAPI:
+    app = FastAPI()
+    workers = asyncio.Semaphore(WORKERS)
+
+    @app.get("/work")
+    async def work():
+        async with workers:
+            await asyncio.sleep(SERVICE_MS / 1000)
+        return {"ok": True}
+
+    if controller is not None:
+        app.add_middleware(admission.AdmissionMiddleware, controller=controller)
+    return app
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def drive(app) -> tuple:
+    ok, shed = [], []
+    remaining = requests
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one_client():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                resp = await client.get("/work")
+                elapsed = (time.perf_counter() - started) * 1000
+                if resp.status_code == 200:
+                    ok.append(elapsed)
+                else:
+                    shed.append(elapsed)
+                    await asyncio.sleep(BACKOFF_MS / 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_client() for _ in range(WORKERS * OFFERED)))
+        wall = time.perf_counter() - started
+
+    return ok, shed, wall
+
+
+def report(name: str, ok, shed, wall) -> None:
+    print(
+        f"{name:12}{len(ok):>7}{len(shed):>7}"
+        f"{percentile(ok, 50):>9.1f}{percentile(ok, 99):>9.1f}"
+        f"{percentile(shed, 99):>10.1f}{len(ok) / wall:>9.0f}"
+    )
+
+
+if __name__ == "__main__":
+    gated = admission.AdmissionController([
+        admission.AdmissionRule(
+            "work",
+            [("GET", "/work")],
+            concurrency=WORKERS,
+            queue_size=WORKERS * 2,
+            timeout=QUEUE_TIMEOUT,
+        ),
+    ])
+
+    print(f"workers={WORKERS} service={SERVICE_MS}ms clients={WORKERS * OFFERED} requests={requests}")
+    print(f"{'':12}{'ok':>7}{'shed':>7}{'p50 ms':>9}{'p99 ms':>9}{'shed p99':>10}{'ok/s':>9}")
+    report("unbounded", *asyncio.run(drive(build_app())))
+    report("admission", *asyncio.run(drive(build_app(gated))))
+    print(gated.stats())
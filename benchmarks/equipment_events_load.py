@@ -0,0 +1,120 @@
+"""Load test for GET /equipment/events: many idle SSE subscribers plus a few writes.
+
+Opens N subscribers against a running inventory-service, checks the server
+reports them all, then updates one piece of equipment a few times and
+measures how long each event takes to reach every subscriber.
+
+Usage:
+    SECRET_KEY=... python benchmarks/equipment_events_load.py [base_url] [subscribers] [updates]
+
+Raise the open-file limit (ulimit -n) on both sides for more than ~1000
+subscribers.
+"""
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import jwt
+
+BASE_URL = sys.argv[1] if len(sys.argv) > 1 else "http://127.0.0.1:8000"
+SUBSCRIBERS = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+UPDATES = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+SECRET_KEY = os.getenv("SECRET_KEY", "SUPER_SECRET_KEY_CHANGE_ME")
+
+
+def make_token(role: str) -> str:
+    payload = {
+        "sub": "1",
+        "role": role,
+        "exp": datetime.utcnow() + timedelta(hours=1),
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+
+
+async def subscribe(client, token, connected, received, stop):
+    params = {"token": token}
+    async with client.stream("GET", "/equipment/events", params=params) as response:
+        response.raise_for_status()
+        connected.release()
+        event = None
+        async for line in response.aiter_lines():
+            if stop.is_set():
+                return
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event == "equipment":
+                version = json.loads(line[len("data: "):])["version"]
+                received.setdefault(version, []).append(time.perf_counter())
+
+
+async def main():
+    user_token = make_token("user")
+    admin = {"Authorization": f"Bearer {make_token('admin')}"}
+    limits = httpx.Limits(max_connections=SUBSCRIBERS + 10, max_keepalive_connections=0)
+    timeout = httpx.Timeout(30, read=None)
+
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits, timeout=timeout) as client:
+        r = await client.post(
+            "/equipment/add",
+            json={"type": "bike", "status": "available", "location": "load-test", "hourly_rate": 5.0},
+            headers=admin,
+        )
+        r.raise_for_status()
+        equipment_id = r.json()["id"]
+
+        connected = asyncio.Semaphore(0)
+        received = {}
+        stop = asyncio.Event()
+
+        started = time.perf_counter()
+        tasks = [
+            asyncio.create_task(subscribe(client, user_token, connected, received, stop))
+            for _ in range(SUBSCRIBERS)
+        ]
+        for _ in range(SUBSCRIBERS):
+            await connected.acquire()
+        connect_time = time.perf_counter() - started
+
+        stats = (await client.get("/equipment/events/stats", headers=admin)).json()
+        print(f"subscribers:   {SUBSCRIBERS} connected in {connect_time:.2f}s, server reports {stats['subscribers']}")
+
+        fanout = []
+        for i in range(UPDATES):
+            sent = time.perf_counter()
+            r = await client.post(
+                "/equipment/update",
+                json={"id": equipment_id, "hourly_rate": 5.0 + i + 1},
+                headers=admin,
+            )
+            r.raise_for_status()
+            version = r.json()["version"]
+
+            deadline = sent + 10
+            while len(received.get(version, ())) < SUBSCRIBERS and time.perf_counter() < deadline:
+                await asyncio.sleep(0.01)
+
+            arrivals = received.get(version, [])
+            if arrivals:
+                fanout.append(max(arrivals) - sent)
+            print(f"update {i + 1}:      delivered to {len(arrivals)}/{SUBSCRIBERS}")
+
+        if fanout:
+            print(f"fan-out:       median {statistics.median(fanout) * 1000:.1f} ms, max {max(fanout) * 1000:.1f} ms")
+
+        stats = (await client.get("/equipment/events/stats", headers=admin)).json()
+        print(f"server stats:  {stats}")
+
+        stop.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,480 @@
+"""In-process load-regression suite for auth, inventory and rental.
+
+Each service runs in its own subprocess because the services share module
+names such as `main` and `models`. Requests are served through httpx's ASGI
+transport against a seeded SQLite file. Rental's inventory calls go to an
+in-memory stand-in app. Seeded databases are cached in BENCH_DIR and
+copied fresh for every run.
+
+Each endpoint reports p50/p95/p99 latency and throughput. The run fails
+when p95 rises, or throughput falls, by more than --tolerance against
+benchmarks/baselines.json. Baselines are only compared when they were
+recorded with the same sizes, and they are machine-specific: refresh them
+with --update-baseline on the machine that runs the suite. The machine and
+the feature flags they were recorded with are stored next to them.
+
+Usage:
+    python benchmarks/load_suite.py [--bikes 10000] [--rentals 1000000]
+        [--requests 500] [--concurrency 8] [--only auth,rental]
+        [--update-baseline]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES = os.path.join(ROOT, "benchmarks", "baselines.json")
+BENCH_DIR = os.getenv("BENCH_DIR", os.path.join(tempfile.gettempdir(), "bike4you-bench"))
+
+SERVICES = ("auth", "inventory", "rental")
+SECRET_KEY = "BENCHMARK_SECRET_KEY_0123456789abcdef"
+PASSWORD = "benchpass123"
+SEED = 42
+SEED_CHUNK = 50_000
+
+TYPES = ("bike", "scooter", "ski")
+LOCATIONS = ("campus", "dorm", "center")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bikes", type=int, default=10_000)
+    parser.add_argument("--rentals", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--login-requests", type=int, default=50, help="bcrypt bound, so fewer")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--only", default=",".join(SERVICES))
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--service", choices=SERVICES, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def config_of(args) -> dict:
+    return {
+        "bikes": args.bikes,
+        "rentals": args.rentals,
+        "users": args.users,
+        "requests": args.requests,
+        "login_requests": args.login_requests,
+        "concurrency": args.concurrency,
+    }
+
+
+# flags that change the measured hot paths; recorded with the baselines
+RECORDED_FLAGS = ("DB_MODE", "DB_PROFILE", "FAST_SERIALIZATION", "ADMISSION_ENABLED", "METRICS_ENABLED")
+
+
+def machine_of() -> dict:
+    return {
+        "platform": platform.platform(),
+        "processor": platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "flags": {name: os.environ[name] for name in RECORDED_FLAGS if name in os.environ},
+    }
+
+
+def make_token(user_id: int, role: str) -> str:
+    import jwt
+
+    payload = {"sub": str(user_id), "role": role, "exp": datetime.utcnow() + timedelta(hours=1)}
+    return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+
+
+# --------------------------
+# DRIVER
+# --------------------------
+
+def percentile(sorted_values, pct: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def drive(client, make_request, count: int, concurrency: int, warmup: int = 0) -> dict:
+    # untimed requests first, so one-off cold work (cache fills) is not the tail
+    for i in range(count, count + warmup):
+        await make_request(client, i)
+
+    latencies = []
+    errors = 0
+    pending = iter(range(count))
+
+    async def worker():
+        nonlocal errors
+        for i in pending:
+            started = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": count,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "throughput_rps": round(count / wall, 1),
+    }
+
+
+# --------------------------
+# SEEDING
+# --------------------------
+
+def insert_chunks(engine, table, rows) -> None:
+    chunk = []
+    with engine.begin() as conn:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= SEED_CHUNK:
+                conn.execute(table.insert(), chunk)
+                chunk = []
+        if chunk:
+            conn.execute(table.insert(), chunk)
+
+
+def seed_auth(main, args) -> None:
+    from hashing import get_pwd_context
+
+    hashed = get_pwd_context().hash(PASSWORD)
+    now = datetime.utcnow()
+    insert_chunks(
+        main.engine,
+        main.models.User.__table__,
+        (
+            {
+                "name": f"User {i}",
+                "email": f"user{i}@kamk.fi",
+                "hashed_password": hashed,
+                "role": "user",
+                "created_at": now,
+            }
+            for i in range(1, args.users + 1)
+        ),
+    )
+
+
+def seed_inventory(main, args) -> None:
+    now = datetime.utcnow()
+    insert_chunks(
+        main.engine,
+        main.models.Equipment.__table__,
+        (
+            {
+                "type": TYPES[i % len(TYPES)],
+                "status": "available" if i % 5 else "rented",
+                "location": LOCATIONS[i % len(LOCATIONS)],
+                "hourly_rate": 4.0 + i % 4,
+                "created_at": now,
+                "version": 0,
+            }
+            for i in range(1, args.bikes + 1)
+        ),
+    )
+
+
+def seed_rental(main, args) -> None:
+    rng = random.Random(SEED)
+    now = datetime.utcnow()
+
+    def rows():
+        for _ in range(args.rentals):
+            equipment_id = rng.randint(1, args.bikes)
+            start = now - timedelta(minutes=rng.randint(60, 365 * 24 * 60))
+            minutes = rng.randint(5, 240)
+            rate = 4.0 + equipment_id % 4
+            yield {
+                "user_id": rng.randint(1, args.users),
+                "equipment_id": equipment_id,
+                "start_time": start,
+                "end_time": start + timedelta(minutes=minutes),
+                "status": "completed",
+                "total_minutes": minutes,
+                "total_price": -(-minutes // 60) * rate,
+                "penalty_eur": 0.0,
+                "hourly_rate": rate,
+                "equipment_type": TYPES[equipment_id % len(TYPES)],
+            }
+
+    from database import SessionLocal
+
+    insert_chunks(main.engine, main.models.Rental.__table__, rows())
+    with SessionLocal() as s:
+        main.analytics.rebuild(s)
+
+
+SEEDERS = {"auth": seed_auth, "inventory": seed_inventory, "rental": seed_rental}
+
+SEED_SIZES = {
+    "auth": lambda a: f"u{a.users}",
+    "inventory": lambda a: f"b{a.bikes}",
+    "rental": lambda a: f"r{a.rentals}-u{a.users}-b{a.bikes}",
+}
+
+
+# --------------------------
+# SCENARIOS
+# --------------------------
+
+async def scenario_auth(client, args) -> dict:
+    rng = random.Random(SEED)
+
+    async def login(c, i):
+        email = f"user{rng.randint(1, args.users)}@kamk.fi"
+        return await c.post("/auth/login", json={"email": email, "password": PASSWORD})
+
+    return {"POST /auth/login": await drive(client, login, args.login_requests, args.concurrency)}
+
+
+async def scenario_inventory(client, args) -> dict:
+    rng = random.Random(SEED)
+    headers = {"Authorization": f"Bearer {make_token(1, 'user')}"}
+
+    async def full_list(c, i):
+        return await c.get("/equipment", headers=headers)
+
+    async def page(c, i):
+        params = {"limit": 100, "after_id": rng.randint(0, args.bikes)}
+        return await c.get("/equipment", params=params, headers=headers)
+
+    return {
+        "GET /equipment": await drive(client, full_list, args.requests, args.concurrency, warmup=3),
+        "GET /equipment?limit=100": await drive(client, page, args.requests, args.concurrency, warmup=3),
+    }
+
+
+def inventory_stand_in():
+    from fastapi import FastAPI, HTTPException
+
+    app = FastAPI()
+    rented = set()
+
+    def item(equipment_id: int, status: str) -> dict:
+        return {
+            "id": equipment_id,
+            "type": TYPES[equipment_id % len(TYPES)],
+            "status": status,
+            "location": LOCATIONS[equipment_id % len(LOCATIONS)],
+            "hourly_rate": 4.0 + equipment_id % 4,
+            "version": 1,
+        }
+
+    @app.get("/equipment/{equipment_id}")
+    async def get_equipment(equipment_id: int):
+        return item(equipment_id, "rented" if equipment_id in rented else "available")
+
+    @app.post("/equipment/{equipment_id}/reserve")
+    async def reserve(equipment_id: int):
+        if equipment_id in rented:
+            raise HTTPException(409, "Equipment is rented, expected available")
+        rented.add(equipment_id)
+        return item(equipment_id, "rented")
+
+    @app.post("/equipment/{equipment_id}/release")
+    async def release(equipment_id: int):
+        if equipment_id not in rented:
+            raise HTTPException(409, "Equipment is available, expected rented")
+        rented.discard(equipment_id)
+        return item(equipment_id, "available")
+
+    return app
+
+
+async def scenario_rental(client, args) -> dict:
+    rng = random.Random(SEED)
+    admin = {"Authorization": f"Bearer {make_token(1, 'admin')}"}
+    users = [
+        {"Authorization": f"Bearer {make_token(i, 'user')}"}
+        for i in range(1, args.concurrency + 1)
+    ]
+    started = []
+
+    async def start(c, i):
+        response = await c.post(
+            "/rentals/start",
+            json={"equipment_id": i + 1},
+            headers=users[i % len(users)],
+        )
+        if response.status_code == 200:
+            started.append((response.json()["id"], i))
+        return response
+
+    async def return_(c, i):
+        rental_id, owner = started[i]
+        return await c.post(f"/rentals/return/{rental_id}", headers=users[owner % len(users)])
+
+    async def list_all(c, i):
+        params = {"limit": 50}
+        if i % 2:
+            params["status"] = "completed"
+        if i % 3 == 0:
+            since = datetime.utcnow() - timedelta(days=rng.randint(1, 30))
+            params["start_from"] = since.isoformat()
+        return await c.get("/rentals/all", params=params, headers=admin)
+
+    results = {"POST /rentals/start": await drive(client, start, args.requests, args.concurrency)}
+    results["POST /rentals/return/{id}"] = await drive(
+        client, return_, len(started), args.concurrency
+    )
+    results["GET /rentals/all"] = await drive(
+        client, list_all, args.requests, args.concurrency, warmup=3
+    )
+    return results
+
+
+SCENARIOS = {"auth": scenario_auth, "inventory": scenario_inventory, "rental": scenario_rental}
+
+
+# --------------------------
+# CHILD: ONE SERVICE
+# --------------------------
+
+def run_service(args) -> dict:
+    service = args.service
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    cached = os.path.join(BENCH_DIR, f"{service}-{SEED_SIZES[service](args)}.db")
+    work = os.path.join(BENCH_DIR, f"{service}-work.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(work + suffix):
+            os.remove(work + suffix)
+
+    seeded = os.path.exists(cached)
+    if seeded:
+        shutil.copyfile(cached, work)
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{work}"
+    os.environ["SECRET_KEY"] = SECRET_KEY
+    os.environ.setdefault("DB_MODE", "async")
+    # the suite measures the request paths, not shedding: every request comes from one
+    # client (so the per-client login limit would refuse most logins) and bcrypt-bound
+    # logins queue past the default admission deadline on small machines
+    os.environ.setdefault("LOGIN_RATE_PER_MINUTE", "1000000")
+    os.environ.setdefault("ADMISSION_QUEUE_TIMEOUT", "60")
+    sys.path.insert(0, os.path.join(ROOT, f"{service}-service"))
+
+    import httpx
+    import main
+
+    if not seeded:
+        from migrations import MIGRATIONS
+        from schema import migrate
+
+        started = time.perf_counter()
+        migrate(main.engine, MIGRATIONS)
+        SEEDERS[service](main, args)
+        with main.engine.begin() as conn:
+            conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+        shutil.copyfile(work, cached)
+        print(f"seeded {service} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    if service == "rental":
+        main.inventory._client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=inventory_stand_in()),
+            base_url="http://inventory",
+        )
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with main.app.router.lifespan_context(main.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                return await SCENARIOS[service](client, args)
+
+    return asyncio.run(run())
+
+
+# --------------------------
+# PARENT: RUN + COMPARE
+# --------------------------
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    failures = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            failures.append(f"{name}: p95 {current['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            failures.append(
+                f"{name}: {current['throughput_rps']} rps vs baseline {base['throughput_rps']} rps"
+            )
+        if current["errors"] > base.get("errors", 0):
+            failures.append(f"{name}: {current['errors']} errors vs baseline {base.get('errors', 0)}")
+    return failures
+
+
+def main():
+    args = parse_args()
+
+    if args.service:
+        print("RESULT " + json.dumps(run_service(args)))
+        return
+
+    argv = [a for a in sys.argv[1:] if a != "--update-baseline"]
+    results = {}
+    for service in args.only.split(","):
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), *argv, "--service", service],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        lines = [l for l in proc.stdout.splitlines() if l.startswith("RESULT ")]
+        if proc.returncode != 0 or not lines:
+            print(f"{service}: benchmark run failed (exit {proc.returncode})")
+            sys.exit(2)
+        results.update(json.loads(lines[-1][len("RESULT "):]))
+
+    print(f"{'endpoint':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>10}{'errors':>8}")
+    for name, r in results.items():
+        print(
+            f"{name:<28}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}"
+            f"{r['throughput_rps']:>10}{r['errors']:>8}"
+        )
+
+    stored = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as f:
+            stored = json.load(f)
+
+    if args.update_baseline:
+        merged = stored.get("results", {}) if stored.get("config") == config_of(args) else {}
+        merged.update(results)
+        with open(BASELINES, "w") as f:
+            json.dump({"config": config_of(args), "machine": machine_of(), "results": merged}, f, indent=2)
+            f.write("\n")
+        print(f"baselines written to {BASELINES}")
+        return
+
+    if stored.get("config") != config_of(args):
+        print("no baselines recorded for this configuration; run with --update-baseline")
+        return
+    if stored.get("machine") != machine_of():
+        print(f"note: baselines were recorded on {stored.get('machine')}")
+
+    failures = compare(results, stored["results"], args.tolerance)
+    for failure in failures:
+        print("REGRESSION " + failure)
+    if failures:
+        sys.exit(1)
+    print(f"no regressions (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Per-request cost of the /metrics instrumentation, checked against its budget.
+
+Measures the ASGI middleware around a no-op app and the SQLAlchemy hooks
+around `SELECT 1` on in-memory SQLite, each against an uninstrumented
+baseline. The per-request estimate assumes QUERIES_PER_REQUEST statements.
+Exits non-zero when the estimate exceeds METRICS_OVERHEAD_BUDGET_US.
+
+Usage:
+    python benchmarks/metrics_overhead_bench.py [service] [iterations]
+"""
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+service = sys.argv[1] if len(sys.argv) > 1 else "rental-service"
+iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+
+QUERIES_PER_REQUEST = int(os.getenv("QUERIES_PER_REQUEST", "3"))
+
+sys.path.insert(0, os.path.join(ROOT, service))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+
+import metrics  # noqa: E402
+
+
+class FakeRoute:
+    path = "/bench/{item_id}"
+
+
+async def noop_app(scope, receive, send):
+    scope["route"] = FakeRoute
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+def time_app(app) -> float:
+    async def loop():
+        scope = {"type": "http", "method": "GET", "path": "/bench/1"}
+        for _ in range(100):
+            await app(dict(scope), receive, send)
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await app(dict(scope), receive, send)
+        return time.perf_counter() - started
+
+    return asyncio.run(loop()) / iterations * 1e6
+
+
+def time_queries(instrumented: bool) -> float:
+    engine = create_engine("sqlite://")
+    if instrumented:
+        metrics.instrument_engine(engine)
+
+    with engine.connect() as conn:
+        stmt = text("SELECT 1")
+        for _ in range(100):
+            conn.execute(stmt)
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            conn.execute(stmt)
+        elapsed = time.perf_counter() - started
+
+    engine.dispose()
+    return elapsed / iterations * 1e6
+
+
+if __name__ == "__main__":
+    bare_app = time_app(noop_app)
+    wrapped_app = time_app(metrics.MetricsMiddleware(noop_app))
+    bare_query = time_queries(instrumented=False)
+    hooked_query = time_queries(instrumented=True)
+
+    middleware = wrapped_app - bare_app
+    per_query = hooked_query - bare_query
+    per_request = middleware + QUERIES_PER_REQUEST * per_query
+    budget = metrics.METRICS_OVERHEAD_BUDGET_US
+
+    print(f"service:      {service}")
+    print(f"middleware:   {middleware:8.2f} us/request ({bare_app:.2f} -> {wrapped_app:.2f})")
+    print(f"db hooks:     {per_query:8.2f} us/query   ({bare_query:.2f} -> {hooked_query:.2f})")
+    print(f"per request:  {per_request:8.2f} us with {QUERIES_PER_REQUEST} queries, budget {budget:.0f} us")
+
+    if per_request > budget:
+        print("FAIL: instrumentation overhead is over budget")
+        sys.exit(1)
@@ -0,0 +1,79 @@
+"""Nearby lookup cost: grid index vs scanning every available item.
+
+Scatters ITEMS available items over a CITY_KM square and times random
+`nearby` queries against geo_index.GeoIndex and against the linear scan
+that filtering the full /equipment list amounts to. Both must agree.
+
+Usage:
+    python benchmarks/nearby_bench.py [items] [queries]
+"""
+import math
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "inventory-service"))
+
+import geo_index  # noqa: E402
+
+items = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+queries = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+CITY_KM = float(os.getenv("CITY_KM", "30"))
+RADIUS_M = float(os.getenv("RADIUS_M", "1000"))
+CENTER = (64.2219, 27.7278)
+
+
+def random_point(rng: random.Random) -> tuple:
+    dlat = CITY_KM * 1000 / geo_index.METERS_PER_DEG_LAT / 2
+    dlon = dlat / math.cos(math.radians(CENTER[0]))
+    return (
+        CENTER[0] + rng.uniform(-dlat, dlat),
+        CENTER[1] + rng.uniform(-dlon, dlon),
+    )
+
+
+def linear(points, lat, lon, radius, limit=20):
+    found = []
+    for equipment_id, (p_lat, p_lon) in points.items():
+        distance = geo_index.distance_m(lat, lon, p_lat, p_lon)
+        if distance <= radius:
+            found.append((distance, equipment_id))
+    found.sort()
+    return [(equipment_id, distance) for distance, equipment_id in found[:limit]]
+
+
+if __name__ == "__main__":
+    rng = random.Random(42)
+    index = geo_index.GeoIndex()
+    points = {}
+
+    started = time.perf_counter()
+    for equipment_id in range(1, items + 1):
+        lat, lon = random_point(rng)
+        points[equipment_id] = (lat, lon)
+        index.update({"id": equipment_id, "type": "bike", "status": "available", "latitude": lat, "longitude": lon})
+    build = time.perf_counter() - started
+
+    probes = [random_point(rng) for _ in range(queries)]
+
+    started = time.perf_counter()
+    grid_results = [index.nearby(lat, lon, RADIUS_M) for lat, lon in probes]
+    grid = (time.perf_counter() - started) / queries
+
+    scan_probes = probes[: max(1, queries // 10)]  # the scan is slow; sample it
+    started = time.perf_counter()
+    scan_results = [linear(points, lat, lon, RADIUS_M) for lat, lon in scan_probes]
+    scan = (time.perf_counter() - started) / len(scan_probes)
+
+    for got, want in zip(grid_results, scan_results):
+        assert [i for i, _ in got] == [i for i, _ in want], "grid and scan disagree"
+
+    stats = index.stats()
+    print(f"items:      {items} over {CITY_KM:.0f} km, radius {RADIUS_M:.0f} m, cell {index.cell_deg} deg")
+    print(f"build:      {build * 1e6 / items:.2f} us/item ({stats['cells']} cells)")
+    print(f"grid:       {grid * 1e3:.3f} ms/query, {stats['candidates'] / queries:.0f} candidates/query")
+    print(f"scan:       {scan * 1e3:.3f} ms/query, {items} candidates/query")
+    print(f"speedup:    {scan / grid:.0f}x")
@@ -0,0 +1,156 @@
+"""Reservation overlap and free-slot cost: interval index vs SQL vs a scan.
+
+Books RESERVATIONS disjoint reservations over EQUIPMENT items across the
+booking horizon, then times random conflict checks and free-slot queries
+against reservations.ReservationIndex, against the indexed SQLite query
+(ix_reservations_equipment_id_start_time) the database alone would run,
+and against a linear scan of one equipment's reservations. All must agree.
+
+Usage:
+    python benchmarks/reservations_bench.py [reservations] [equipment] [queries]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "rental-service"))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine, insert, text  # noqa: E402
+
+import models  # noqa: E402
+import reservations  # noqa: E402
+
+total = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+equipment = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+queries = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+
+EPOCH = datetime(2026, 1, 1)
+HORIZON = timedelta(days=reservations.RESERVATION_HORIZON_DAYS)
+MIN_LENGTH = timedelta(minutes=reservations.RESERVATION_MIN_MINUTES)
+
+
+def book(rng: random.Random):
+    """Disjoint reservations per equipment: one per equal slot of the horizon, at a random offset."""
+    rows = []
+    per_item = total // equipment
+    slot = HORIZON / per_item
+    assert slot >= 2 * MIN_LENGTH, "too many reservations per equipment for the horizon"
+    for equipment_id in range(1, equipment + 1):
+        for n in range(per_item):
+            length = max(MIN_LENGTH, rng.uniform(0.2, 0.6) * slot)
+            start = EPOCH + slot * n + rng.uniform(0, 1) * (slot - length)
+            rows.append((len(rows) + 1, equipment_id, start, start + length))
+    return rows
+
+
+def probe(rng: random.Random):
+    start = EPOCH + timedelta(minutes=rng.randrange(0, int(HORIZON.total_seconds() // 60)))
+    return rng.randrange(1, equipment + 1), start, start + timedelta(minutes=rng.randrange(15, 2 * 60))
+
+
+def scan_conflict(rows, start, end):
+    for reservation_id, _, r_start, r_end in rows:
+        if r_start < end and r_end > start:
+            return reservation_id
+    return None
+
+
+def scan_free(rows, start, end, min_length):
+    slots = []
+    cursor = start
+    for _, _, r_start, r_end in sorted(rows, key=lambda r: r[2]):
+        if r_end <= start or r_start >= end:
+            continue
+        if r_start - cursor >= min_length:
+            slots.append((cursor, r_start))
+        cursor = max(cursor, r_end)
+    if end - cursor >= min_length:
+        slots.append((cursor, end))
+    return slots
+
+
+SQL_CONFLICT = text(
+    "SELECT id FROM reservations"
+    " WHERE equipment_id = :eid AND start_time < :end AND end_time > :start"
+    " AND status IN ('booked', 'converted') LIMIT 1"
+)
+SQL_WINDOW = text(
+    "SELECT start_time, end_time FROM reservations"
+    " WHERE equipment_id = :eid AND start_time < :end AND end_time > :start"
+    " AND status IN ('booked', 'converted') ORDER BY start_time"
+)
+
+
+def sql_free(conn, equipment_id, start, end, min_length):
+    slots = []
+    cursor = start
+    for r_start, r_end in conn.execute(SQL_WINDOW, {"eid": equipment_id, "start": start, "end": end}):
+        r_start, r_end = datetime.fromisoformat(str(r_start)), datetime.fromisoformat(str(r_end))
+        if r_start - cursor >= min_length:
+            slots.append((cursor, r_start))
+        cursor = max(cursor, r_end)
+    if end - cursor >= min_length:
+        slots.append((cursor, end))
+    return slots
+
+
+def timed(fn, args):
+    started = time.perf_counter()
+    results = [fn(*a) for a in args]
+    return results, (time.perf_counter() - started) / len(args)
+
+
+if __name__ == "__main__":
+    rng = random.Random(42)
+    rows = book(rng)
+    by_equipment = {}
+    for row in rows:
+        by_equipment.setdefault(row[1], []).append(row)
+
+    index = reservations.ReservationIndex()
+    started = time.perf_counter()
+    for reservation_id, equipment_id, start, end in rows:
+        index.add(equipment_id, reservation_id, start, end)
+    build = time.perf_counter() - started
+
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine, tables=[models.Reservation.__table__])
+    with engine.begin() as conn:
+        conn.execute(insert(models.Reservation.__table__), [
+            {"id": r[0], "user_id": 1, "equipment_id": r[1], "start_time": r[2], "end_time": r[3], "status": "booked"}
+            for r in rows
+        ])
+
+    probes = [probe(rng) for _ in range(queries)]
+    windows = [(eid, start, start + timedelta(days=2)) for eid, start, _ in probes]
+
+    conflicts, index_conflict = timed(index.conflict, probes)
+    free, index_free = timed(lambda e, s, t: index.free(e, s, t, MIN_LENGTH), windows)
+
+    with engine.connect() as conn:
+        sql_conflicts, sql_conflict = timed(
+            lambda e, s, t: conn.execute(SQL_CONFLICT, {"eid": e, "start": s, "end": t}).scalar(), probes
+        )
+        sql_slots, sql_free_time = timed(lambda e, s, t: sql_free(conn, e, s, t, MIN_LENGTH), windows)
+
+    scan_conflicts, scan_conflict_time = timed(lambda e, s, t: scan_conflict(by_equipment[e], s, t), probes)
+    scan_slots, scan_free_time = timed(lambda e, s, t: scan_free(by_equipment[e], s, t, MIN_LENGTH), windows)
+
+    # disjoint intervals: at most one can overlap a short probe, but compare as booleans to be safe
+    for got, want, sql in zip(conflicts, scan_conflicts, sql_conflicts):
+        assert (got is None) == (want is None) == (sql is None), "conflict checks disagree"
+    assert free == scan_slots == sql_slots, "free slots disagree"
+
+    hit_rate = sum(c is not None for c in conflicts) / queries
+    print(f"reservations: {len(rows)} over {equipment} equipment, {HORIZON.days} days")
+    print(f"build:        {build * 1e6 / len(rows):.2f} us/reservation")
+    print(f"conflict:     index {index_conflict * 1e6:.2f} us, sqlite {sql_conflict * 1e6:.2f} us,"
+          f" scan {scan_conflict_time * 1e6:.2f} us ({hit_rate:.0%} conflicting)")
+    print(f"free (2 d):   index {index_free * 1e6:.2f} us, sqlite {sql_free_time * 1e6:.2f} us,"
+          f" scan {scan_free_time * 1e6:.2f} us")
+    print(f"speedup:      {sql_conflict / index_conflict:.0f}x / {scan_conflict_time / index_conflict:.0f}x conflict,"
+          f" {sql_free_time / index_free:.0f}x / {scan_free_time / index_free:.0f}x free (vs sqlite / scan)")
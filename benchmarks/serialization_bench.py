@@ -0,0 +1,126 @@
+"""Per-row cost of list responses: validated ORM path vs the FAST_SERIALIZATION path.
+
+"validated" is what a response_model route does: load ORM entities, validate
+them with from_attributes, dump in JSON mode and encode with json.dumps.
+"fast" selects column tuples, shapes them with RowSerializer and encodes
+them with fastjson.dumps (orjson when installed). Both paths run against
+the same in-memory SQLite rows.
+
+Usage:
+    python benchmarks/serialization_bench.py [inventory-service|rental-service] [rows] [repeats]
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+service = sys.argv[1] if len(sys.argv) > 1 else "rental-service"
+rows = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+os.environ["DATABASE_URL"] = "sqlite://"
+sys.path.insert(0, os.path.join(ROOT, service))
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+import database  # noqa: E402
+import fastjson  # noqa: E402
+import models  # noqa: E402
+import schemas  # noqa: E402
+
+# one shared in-memory connection, so every session sees the seeded rows
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+Session = sessionmaker(bind=engine, expire_on_commit=False)
+database.Base.metadata.create_all(bind=engine)
+
+
+def seed() -> tuple:
+    now = datetime.utcnow()
+    with Session() as s:
+        if service == "inventory-service":
+            s.add_all(
+                models.Equipment(
+                    type="bike",
+                    status="available",
+                    location="campus",
+                    image_url=None if i % 2 else f"https://img/{i}.png",
+                    hourly_rate=4.0 + i % 4,
+                    created_at=now,
+                    version=i % 7,
+                )
+                for i in range(rows)
+            )
+            model, schema = models.Equipment, schemas.EquipmentOut
+        else:
+            s.add_all(
+                models.Rental(
+                    user_id=i % 100,
+                    equipment_id=i % 1000,
+                    start_time=now - timedelta(minutes=i),
+                    end_time=now - timedelta(minutes=i - 30),
+                    status="completed",
+                    total_minutes=30,
+                    total_price=4.0,
+                    penalty_eur=0.0,
+                    hourly_rate=4.0,
+                    equipment_type="bike",
+                )
+                for i in range(rows)
+            )
+            model, schema = models.Rental, schemas.Rental
+        s.commit()
+    return model, schema
+
+
+def best_of(fn) -> tuple:
+    best_fetch = best_encode = float("inf")
+    body = b""
+    for _ in range(repeats):
+        fetch, encode, body = fn()
+        best_fetch = min(best_fetch, fetch)
+        best_encode = min(best_encode, encode)
+    return best_fetch / rows * 1e6, best_encode / rows * 1e6, body
+
+
+if __name__ == "__main__":
+    model, schema = seed()
+    adapter = TypeAdapter(List[schema])
+    serializer = fastjson.RowSerializer(model, schema)
+
+    def validated():
+        started = time.perf_counter()
+        with Session() as s:
+            items = s.query(model).all()
+        fetched = time.perf_counter()
+        content = adapter.dump_python(adapter.validate_python(items, from_attributes=True), mode="json")
+        body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return fetched - started, time.perf_counter() - fetched, body
+
+    def fast():
+        started = time.perf_counter()
+        with Session() as s:
+            items = s.query(*serializer.columns).all()
+        fetched = time.perf_counter()
+        body = fastjson.dumps(serializer(items))
+        return fetched - started, time.perf_counter() - fetched, body
+
+    slow_fetch, slow_encode, slow_body = best_of(validated)
+    fast_fetch, fast_encode, fast_body = best_of(fast)
+    assert json.loads(slow_body) == json.loads(fast_body), "paths disagree"
+
+    print(f"service:    {service}, {rows} rows, orjson={'yes' if fastjson.orjson else 'no'}")
+    print(f"{'':12}{'fetch':>10}{'encode':>10}{'total':>10}   us/row")
+    print(f"{'validated':12}{slow_fetch:>10.2f}{slow_encode:>10.2f}{slow_fetch + slow_encode:>10.2f}")
+    print(f"{'fast':12}{fast_fetch:>10.2f}{fast_encode:>10.2f}{fast_fetch + fast_encode:>10.2f}")
+    print(f"speedup:    {(slow_fetch + slow_encode) / (fast_fetch + fast_encode):.1f}x")
@@ -0,0 +1,57 @@
+"""Per-request auth overhead of get_current_user, with and without the token cache.
+
+Usage:
+    python benchmarks/token_cache_bench.py [inventory-service|rental-service] [iterations]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+service = sys.argv[1] if len(sys.argv) > 1 else "inventory-service"
+iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.join(ROOT, service))
+
+import jwt  # noqa: E402
+from fastapi.security import HTTPAuthorizationCredentials  # noqa: E402
+
+import main  # noqa: E402
+from token_cache import token_cache  # noqa: E402
+
+
+def make_token() -> HTTPAuthorizationCredentials:
+    payload = {
+        "sub": "42",
+        "role": "user",
+        "exp": datetime.utcnow() + timedelta(hours=1),
+    }
+    token = jwt.encode(payload, main.SECRET_KEY, algorithm=main.ALGORITHM)
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def run(creds: HTTPAuthorizationCredentials, cached: bool) -> float:
+    token_cache.clear()
+    token_cache.hits = token_cache.misses = 0
+    token_cache.maxsize = 4096 if cached else 0
+
+    main.get_current_user(creds)  # warm-up
+    started = time.perf_counter()
+    for _ in range(iterations):
+        main.get_current_user(creds)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+if __name__ == "__main__":
+    creds = make_token()
+    uncached = run(creds, cached=False)
+    cached = run(creds, cached=True)
+
+    print(f"service:   {service}")
+    print(f"uncached:  {uncached:8.2f} us/request")
+    print(f"cached:    {cached:8.2f} us/request")
+    print(f"speedup:   {uncached / cached:8.1f}x")
+    print(f"counters:  {token_cache.stats()}")
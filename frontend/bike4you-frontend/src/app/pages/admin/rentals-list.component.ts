@@ -1,12 +1,12 @@
 import { Component, OnInit } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
-import { NgFor } from '@angular/common';
+import { NgFor, NgIf } from '@angular/common';
 import { AuthService } from '../../services/auth.service';
 
 @Component({
   standalone: true,
   styleUrls: ['./admin.scss'],
-  imports: [NgFor],
+  imports: [NgFor, NgIf],
   selector: 'app-rentals-list',
   template: `
     <h2>All Rentals</h2>
@@ -16,22 +16,43 @@ import { AuthService } from '../../services/auth.service';
       </tr>
       <tr *ngFor="let r of rentals">
         <td>{{ r.id }}</td>
-        <td>{{ r.user_id }}</td>
-        <td>{{ r.equipment_id }}</td>
+        <td>{{ r.user?.name ?? r.user_id }}</td>
+        <td>{{ r.equipment?.type ?? '' }} {{ r.equipment_id }}</td>
         <td>{{ r.status }}</td>
         <td>{{ r.total_price }}</td>
       </tr>
     </table>
+
+    <button *ngIf="nextCursor" (click)="loadMore()" [disabled]="loading">
+      {{ loading ? 'Loading...' : 'Load more' }}
+    </button>
   `
 })
 export class RentalsListComponent implements OnInit {
   rentals: any[] = [];
+  // the list is cursor-paginated; set while more pages remain
+  nextCursor: string | null = null;
+  loading = false;
 
   constructor(private http: HttpClient, private auth: AuthService) {}
 
   ngOnInit() {
-    this.http.get<any[]>('http://localhost:8003/rentals/all', {
-      headers: this.auth.getAuthHeaders()
-    }).subscribe(res => this.rentals = res);
+    this.loadMore();
+  }
+
+  loadMore() {
+    const params: { [name: string]: string } = this.nextCursor ? { cursor: this.nextCursor } : {};
+    this.loading = true;
+    this.http.get<{ items: any[]; next_cursor?: string | null }>('http://localhost:8003/rentals/all/enriched', {
+      headers: this.auth.getAuthHeaders(),
+      params
+    }).subscribe({
+      next: res => {
+        this.rentals = this.rentals.concat(res.items);
+        this.nextCursor = res.next_cursor ?? null;
+        this.loading = false;
+      },
+      error: () => this.loading = false
+    });
   }
 }
@@ -1,6 +1,6 @@
 import { Injectable } from '@angular/core';
-import { HttpClient } from '@angular/common/http';
-import { Observable } from 'rxjs';
+import { HttpClient, HttpParams } from '@angular/common/http';
+import { EMPTY, Observable, expand, map, reduce } from 'rxjs';
 import { environment } from '../../environments/environment';
 
 export interface Rental {
@@ -13,6 +13,15 @@ export interface Rental {
   total_minutes?: number | null;
   total_price?: number | null;
   penalty_eur: number;
+  // only on /rentals/active
+  current_minutes?: number;
+  current_price?: number | null;
+  projected_penalty_eur?: number;
+}
+
+export interface RentalList {
+  items: Rental[];
+  next_cursor?: string | null;
 }
 
 @Injectable({
@@ -26,20 +35,42 @@ export class RentalService {
 
   // backend сам берёт user_id из JWT — параметр userId сохраняем "для вида"
   getActive(userId: number): Observable<Rental[]> {
-    return this.http.get<Rental[]>(`${this.API_URL}/rentals/my`);
+    return this.http
+      .get<RentalList>(`${this.API_URL}/rentals/active`)
+      .pipe(map(page => page.items));
   }
 
+  // /rentals/my is cursor-paginated; follow next_cursor so the full history loads
   getHistory(userId: number): Observable<Rental[]> {
-    return this.http.get<Rental[]>(`${this.API_URL}/rentals/my`);
+    return this.getHistoryPage().pipe(
+      expand(page => page.next_cursor ? this.getHistoryPage(page.next_cursor) : EMPTY),
+      reduce((all: Rental[], page) => all.concat(page.items), [])
+    );
+  }
+
+  private getHistoryPage(cursor?: string): Observable<RentalList> {
+    let params = new HttpParams();
+    if (cursor) {
+      params = params.set('cursor', cursor);
+    }
+    return this.http.get<RentalList>(`${this.API_URL}/rentals/my`, { params });
   }
 
   startRental(userId: number, equipmentId: number): Observable<Rental> {
     return this.http.post<Rental>(`${this.API_URL}/rentals/start`, {
       equipment_id: equipmentId
-    });
+    }, { headers: this.idempotencyHeaders() });
   }
 
   returnRental(id: number): Observable<Rental> {
-    return this.http.post<Rental>(`${this.API_URL}/rentals/return/${id}`, {});
+    return this.http.post<Rental>(`${this.API_URL}/rentals/return/${id}`, {}, {
+      headers: this.idempotencyHeaders()
+    });
+  }
+
+  // one key per user action: a retry of the same request replays the first
+  // response instead of starting or returning the rental again
+  private idempotencyHeaders(): { [name: string]: string } {
+    return { 'Idempotency-Key': crypto.randomUUID() };
   }
 }
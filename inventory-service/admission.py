@@ -0,0 +1,284 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# --------------------------
+# CONFIG
+# --------------------------
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+
+# the default gate covers every route without a rule of its own
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", "64"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "128"))
+# longest a request may wait for a slot before it is shed
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+# behind a proxy every client shares its address; only enable where the proxy
+# appends the real one to X-Forwarded-For
+ADMISSION_TRUST_FORWARDED = os.getenv("ADMISSION_TRUST_FORWARDED", "0") == "1"
+ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", "10000"))
+
+# probes and scrapes must answer even when the app is saturated
+ADMISSION_EXEMPT = ("/health", "/metrics", "/docs", "/openapi.json")
+
+
+# --------------------------
+# GATE
+# --------------------------
+
+class Gate:
+    """Concurrency limit with a bounded FIFO wait queue and a wait deadline."""
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        timeout: float = ADMISSION_QUEUE_TIMEOUT,
+    ):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+
+    async def acquire(self) -> bool:
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+
+        if len(self._waiters) >= self.queue_size:
+            self.rejected_full += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            cancelled = isinstance(exc, asyncio.CancelledError)
+            if waiter.done() and not waiter.cancelled():
+                # release() handed over the slot just as the deadline hit
+                if cancelled:
+                    self.release()
+                    raise
+                self.admitted += 1
+                return True
+
+            waiter.cancel()
+            self._waiters.remove(waiter)
+            if cancelled:
+                raise
+            self.rejected_timeout += 1
+            return False
+
+        # the slot was handed over by release(), so `active` already counts it
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "concurrency": self.concurrency,
+            "queue_depth": len(self._waiters),
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+        }
+
+
+# --------------------------
+# RATE LIMIT
+# --------------------------
+
+class TokenBucket:
+    """Per-client token buckets; `take` returns 0 when allowed, else seconds to wait."""
+
+    def __init__(self, rate: float, burst: int, max_clients: int = ADMISSION_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.limited = 0
+
+    def take(self, client: str) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(client, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+
+        if tokens < 1:
+            self._buckets[client] = (tokens, now)
+            self.limited += 1
+            return (1 - tokens) / self.rate
+
+        self._buckets[client] = (tokens - 1, now)
+        self._buckets.move_to_end(client)
+        # least recently seen clients go first; they would have refilled anyway
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return 0.0
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(self._buckets),
+            "limited": self.limited,
+        }
+
+
+# --------------------------
+# RULES
+# --------------------------
+
+class AdmissionRule:
+    """Routes sharing one gate, matched by method and path prefix.
+
+    `rate`/`burst` add a per-client token bucket (requests per second)
+    checked before the gate.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        routes: Sequence[Tuple[str, str]],
+        concurrency: int,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        rate: Optional[float] = None,
+        burst: int = 1,
+    ):
+        self.name = name
+        self.routes = tuple(routes)
+        self.gate = Gate(name, concurrency, queue_size, timeout)
+        self.bucket = TokenBucket(rate, burst) if rate else None
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        rules: Iterable[AdmissionRule] = (),
+        concurrency: int = ADMISSION_CONCURRENCY,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        exempt: Sequence[str] = ADMISSION_EXEMPT,
+    ):
+        self.rules: List[AdmissionRule] = list(rules)
+        self.default = AdmissionRule("default", (), concurrency, queue_size, timeout)
+        self.exempt = tuple(exempt)
+        # longest prefix first, so a specific rule wins over a broader one
+        self._routes = sorted(
+            ((method, prefix, rule) for rule in self.rules for method, prefix in rule.routes),
+            key=lambda route: len(route[1]),
+            reverse=True,
+        )
+        self._matches: Dict[Tuple[str, str], Optional[AdmissionRule]] = {}
+
+    def match(self, method: str, path: str) -> Optional[AdmissionRule]:
+        key = (method, path)
+        if key in self._matches:
+            return self._matches[key]
+
+        rule: Optional[AdmissionRule] = self.default
+        if path.startswith(self.exempt):
+            rule = None
+        else:
+            for route_method, prefix, candidate in self._routes:
+                if route_method == method and path.startswith(prefix):
+                    rule = candidate
+                    break
+
+        # bounded, so ids in paths cannot grow the memo without limit
+        if len(self._matches) < 4096:
+            self._matches[key] = rule
+        return rule
+
+    def stats(self) -> dict:
+        stats = {}
+        for rule in [self.default, *self.rules]:
+            stats.update({f"{rule.name}_{k}": v for k, v in rule.gate.stats().items()})
+            if rule.bucket is not None:
+                stats.update({f"{rule.name}_{k}": v for k, v in rule.bucket.stats().items()})
+        return stats
+
+
+# --------------------------
+# ASGI MIDDLEWARE
+# --------------------------
+
+def client_key(scope) -> str:
+    if ADMISSION_TRUST_FORWARDED:
+        for name, value in scope.get("headers", ()):
+            if name == b"x-forwarded-for":
+                # the last hop is the one our own proxy appended
+                return value.decode("latin-1").rsplit(",", 1)[-1].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def _reject(send, status_code: int, detail: str, retry_after: float) -> None:
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode("latin-1")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """Sheds load with 503 + Retry-After instead of letting requests queue unbounded."""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rule = self.controller.match(scope["method"], scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        if rule.bucket is not None:
+            wait = rule.bucket.take(client_key(scope))
+            if wait:
+                await _reject(send, 429, "Too many requests", wait)
+                return
+
+        if not await rule.gate.acquire():
+            await _reject(send, 503, "Server busy, retry later", ADMISSION_RETRY_AFTER)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            rule.gate.release()
@@ -0,0 +1,90 @@
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Hashable, NamedTuple, Optional
+
+# --------------------------
+# CONFIG
+# --------------------------
+
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "256"))
+
+
+# --------------------------
+# CACHE
+# --------------------------
+
+class Snapshot(NamedTuple):
+    etag: str
+    body: bytes
+    next_after_id: Optional[int]
+
+
+class CatalogCache:
+    """Serialized `GET /equipment` responses keyed by filter combination.
+
+    Every write to equipment bumps the generation and drops all snapshots,
+    so a snapshot is only ever served for the data it was built from. Only
+    touched from the event loop, so no locking. Each worker process keeps its
+    own cache, which is fine for the single-process deployment.
+    """
+
+    def __init__(self, maxsize: int = CATALOG_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.generation = 0
+        self._entries: "OrderedDict[Hashable, Snapshot]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Snapshot]:
+        snapshot = self._entries.get(key)
+        if snapshot is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return snapshot
+
+    def put(
+        self,
+        key: Hashable,
+        generation: int,
+        body: bytes,
+        next_after_id: Optional[int],
+    ) -> Snapshot:
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        snapshot = Snapshot(etag, body, next_after_id)
+
+        # a write landed while this body was being built: serve it, don't keep it
+        if generation != self.generation or self.maxsize <= 0:
+            return snapshot
+
+        self._entries[key] = snapshot
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "generation": self.generation,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+catalog_cache = CatalogCache()
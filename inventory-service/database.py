@@ -1,17 +1,142 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+import logging
 import os
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable is missing")
+logger = logging.getLogger("uvicorn.error")
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
+# "async" serves requests through AsyncSession (aiosqlite / asyncpg),
+# "sync" through the threadpool and the blocking drivers
+DB_MODE = os.getenv("DB_MODE", "async")
+
+# "tuned" applies the per-backend settings below, "default" keeps SQLAlchemy defaults
+DB_PROFILE = os.getenv("DB_PROFILE", "tuned")
+
+# SQLite
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-64000"))  # negative = KiB
+
+# PostgreSQL
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def _sqlite_pragmas() -> dict:
+    return {
+        "journal_mode": SQLITE_JOURNAL_MODE,
+        "synchronous": SQLITE_SYNCHRONOUS,
+        "mmap_size": SQLITE_MMAP_SIZE,
+        "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": SQLITE_CACHE_SIZE,
+    }
+
+
+def _attach_sqlite_pragmas(sync_engine, pragmas: dict) -> None:
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def _engine_kwargs(backend: str, is_async: bool) -> dict:
+    if DB_PROFILE != "tuned":
+        return {"pool_pre_ping": True}
+
+    if backend == "sqlite":
+        # a local file has no connection to go stale, so skip the pre-ping round trip
+        return {}
+
+    if backend == "postgresql":
+        if is_async:
+            connect_args = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            connect_args = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+        return {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+            "connect_args": connect_args,
+        }
+
+    return {"pool_pre_ping": True}
+
+
+def _create_engines(url: str):
+    backend = make_url(url).get_backend_name()
+    tune_sqlite = DB_PROFILE == "tuned" and backend == "sqlite"
+    pragmas = _sqlite_pragmas()
+
+    sync_engine = create_engine(url, **_engine_kwargs(backend, is_async=False))
+    if tune_sqlite:
+        _attach_sqlite_pragmas(sync_engine, pragmas)
+
+    async_engine = None
+    if DB_MODE == "async":
+        # imported lazily so DB_MODE=sync does not need the async drivers installed
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        async_url = make_url(url).set(drivername=ASYNC_DRIVERS.get(backend, backend))
+        async_engine = create_async_engine(async_url, **_engine_kwargs(backend, is_async=True))
+        if tune_sqlite:
+            _attach_sqlite_pragmas(async_engine.sync_engine, pragmas)
+
+    settings = pragmas if tune_sqlite else _engine_kwargs(backend, is_async=False)
+    logger.info(
+        "database: backend=%s mode=%s profile=%s settings=%s",
+        backend,
+        DB_MODE,
+        DB_PROFILE,
+        settings,
+    )
+    return sync_engine, async_engine
+
+
+# a missing URL is reported at startup (require_engine) rather than on import,
+# so tools and benchmarks can import the service modules without a database
+engine, async_engine = _create_engines(DATABASE_URL) if DATABASE_URL else (None, None)
+
+
+def require_engine():
+    if engine is None:
+        raise ValueError("DATABASE_URL environment variable is missing")
+    return engine
+
+
+# routes return ORM objects that are serialized on the event loop after
+# commit; expired attributes would trigger a lazy load there (and cannot
+# happen at all on an async session), so keep them loaded in both modes
+SessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+    bind=engine,
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = None
+if async_engine is not None:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine,
+        autoflush=False,
+        expire_on_commit=False,
+    )
 
 Base = declarative_base()
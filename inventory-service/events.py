@@ -0,0 +1,113 @@
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Optional, Set
+
+# --------------------------
+# CONFIG
+# --------------------------
+
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "64"))
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "10000"))
+
+
+# --------------------------
+# HUB
+# --------------------------
+
+class Subscriber:
+    __slots__ = ("queue", "type", "location", "dropped")
+
+    def __init__(self, type_: Optional[str], location: Optional[str]):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+        self.type = type_
+        self.location = location
+        self.dropped = False
+
+    def wants(self, event: dict) -> bool:
+        if self.type is not None and event.get("type") != self.type:
+            return False
+        if self.location is not None and event.get("location") != self.location:
+            return False
+        return True
+
+
+class EventHub:
+    """Fans equipment changes out to Server-Sent Events subscribers.
+
+    Each subscriber has a bounded queue; one that falls behind is dropped
+    rather than letting its backlog grow. Only used from the event loop.
+    """
+
+    def __init__(self):
+        self.subscribers: Set[Subscriber] = set()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, type_: Optional[str], location: Optional[str]) -> Optional[Subscriber]:
+        if len(self.subscribers) >= EVENTS_MAX_SUBSCRIBERS:
+            return None
+        subscriber = Subscriber(type_, location)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+
+    def publish(self, event: dict) -> None:
+        self.published += 1
+        data = json.dumps(event, default=str)
+
+        for subscriber in list(self.subscribers):
+            if not subscriber.wants(event):
+                continue
+            try:
+                subscriber.queue.put_nowait(data)
+            except asyncio.QueueFull:
+                subscriber.dropped = True
+                self.dropped += 1
+                self.unsubscribe(subscriber)
+                # wake the stream so it can close the connection
+                subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(None)
+
+    async def stream(self, subscriber: Subscriber) -> AsyncIterator[str]:
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    data = await asyncio.wait_for(subscriber.queue.get(), EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+
+                if data is None:
+                    yield "event: dropped\ndata: {}\n\n"
+                    return
+                yield f"event: equipment\ndata: {data}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "published_total": self.published,
+            "dropped_total": self.dropped,
+        }
+
+
+def equipment_event(item) -> dict:
+    # accepts an ORM row or a mapping from a RETURNING clause
+    get = item.get if isinstance(item, dict) else lambda name: getattr(item, name)
+    return {
+        "id": get("id"),
+        "type": get("type"),
+        "status": get("status"),
+        "location": get("location"),
+        "hourly_rate": get("hourly_rate"),
+        "version": get("version"),
+    }
+
+
+event_hub = EventHub()
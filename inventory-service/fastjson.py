@@ -0,0 +1,72 @@
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Iterable, List, Type
+
+from pydantic import BaseModel
+from starlette.responses import Response
+
+# orjson is optional; without it the same bytes come from the stdlib encoder
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# --------------------------
+# CONFIG
+# --------------------------
+
+# opt-in: list endpoints skip per-row Pydantic validation and encode column tuples directly
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "0") == "1"
+
+
+# --------------------------
+# ENCODING
+# --------------------------
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# --------------------------
+# ROWS
+# --------------------------
+
+class RowSerializer:
+    """Turns column-tuple rows into dicts shaped like a response schema.
+
+    Built once per schema: `columns` selects the schema's fields, in the
+    schema's order, from the ORM model, so the encoded output matches
+    what the validated path returns.
+    """
+
+    def __init__(self, model: Any, schema: Type[BaseModel]):
+        self.fields = tuple(schema.model_fields)
+        self.columns = tuple(getattr(model, name) for name in self.fields)
+
+    def __call__(self, rows: Iterable) -> List[dict]:
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in rows]
+
+    def one(self, row) -> dict:
+        return dict(zip(self.fields, row))
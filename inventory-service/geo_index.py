@@ -0,0 +1,134 @@
+import math
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+# --------------------------
+# CONFIG
+# --------------------------
+
+# cell edge in degrees; 0.01 is about 1.1 km north-south
+GEO_CELL_DEG = float(os.getenv("GEO_CELL_DEG", "0.01"))
+NEARBY_MAX_RADIUS_M = float(os.getenv("NEARBY_MAX_RADIUS_M", "20000"))
+
+EARTH_RADIUS_M = 6_371_000
+METERS_PER_DEG_LAT = 111_320
+
+Cell = Tuple[int, int]
+
+
+class Point(NamedTuple):
+    type: str
+    lat: float
+    lon: float
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    # haversine; plenty accurate at city scale
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dlat = p2 - p1
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+# --------------------------
+# INDEX
+# --------------------------
+
+class GeoIndex:
+    """Uniform lat/lon grid over the available equipment that has coordinates.
+
+    Writes keep it current one item at a time (`update`), so a query only
+    reads the cells overlapping its radius. Rows outside the index (rented,
+    no coordinates) are simply absent. Only touched from the event loop;
+    each worker process keeps its own, like the catalog cache.
+    """
+
+    def __init__(self, cell_deg: float = GEO_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._cells: Dict[Cell, Set[int]] = defaultdict(set)
+        self._points: Dict[int, Point] = {}
+        self.queries = 0
+        self.cells_scanned = 0
+        self.candidates = 0
+
+    def _cell(self, lat: float, lon: float) -> Cell:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def _remove(self, equipment_id: int) -> None:
+        point = self._points.pop(equipment_id, None)
+        if point is None:
+            return
+        cell = self._cell(point.lat, point.lon)
+        members = self._cells[cell]
+        members.discard(equipment_id)
+        if not members:
+            del self._cells[cell]
+
+    def update(self, item) -> None:
+        """Index or drop one equipment; accepts an ORM row or a RETURNING mapping."""
+        get = item.get if isinstance(item, dict) else lambda name: getattr(item, name, None)
+        equipment_id = get("id")
+        lat, lon = get("latitude"), get("longitude")
+
+        self._remove(equipment_id)
+        if get("status") != "available" or lat is None or lon is None:
+            return
+
+        self._points[equipment_id] = Point(get("type"), lat, lon)
+        self._cells[self._cell(lat, lon)].add(equipment_id)
+
+    def load(self, rows: Iterable) -> None:
+        self._cells.clear()
+        self._points.clear()
+        for row in rows:
+            self.update(row)
+
+    def nearby(
+        self,
+        lat: float,
+        lon: float,
+        radius_m: float,
+        type_: Optional[str] = None,
+        limit: int = 20,
+    ) -> List[Tuple[int, float]]:
+        """(id, distance) of indexed items within `radius_m`, nearest first."""
+        self.queries += 1
+        dlat = radius_m / METERS_PER_DEG_LAT
+        # longitude degrees shrink towards the poles; clamp so the box stays finite
+        dlon = dlat / max(math.cos(math.radians(lat)), 0.01)
+
+        min_y, min_x = self._cell(lat - dlat, lon - dlon)
+        max_y, max_x = self._cell(lat + dlat, lon + dlon)
+
+        found = []
+        for y in range(min_y, max_y + 1):
+            for x in range(min_x, max_x + 1):
+                members = self._cells.get((y, x))
+                if not members:
+                    continue
+                self.cells_scanned += 1
+                for equipment_id in members:
+                    point = self._points[equipment_id]
+                    if type_ is not None and point.type != type_:
+                        continue
+                    self.candidates += 1
+                    distance = distance_m(lat, lon, point.lat, point.lon)
+                    if distance <= radius_m:
+                        found.append((distance, equipment_id))
+
+        found.sort()
+        return [(equipment_id, distance) for distance, equipment_id in found[:limit]]
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._points),
+            "cells": len(self._cells),
+            "queries": self.queries,
+            "cells_scanned": self.cells_scanned,
+            "candidates": self.candidates,
+        }
+
+
+geo_index = GeoIndex()
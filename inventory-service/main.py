@@ -1,17 +1,40 @@
+from contextlib import asynccontextmanager
 from typing import List, Optional
 
-from fastapi import FastAPI, Depends, HTTPException, Query, status
+import httpx
+from fastapi import BackgroundTasks, FastAPI, Depends, Header, HTTPException, Query, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.openapi.utils import get_openapi
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 import jwt
 import os
+import time
 
+from admission import ADMISSION_ENABLED, ADMISSION_EXEMPT, AdmissionController, AdmissionMiddleware
 import models
 import schemas
-from database import Base, engine
-from deps import get_db
+from database import SessionLocal, async_engine, engine, require_engine
+from catalog_cache import catalog_cache, etag_matches
+from deps import Database, get_db
+from events import equipment_event, event_hub
+from geo_index import NEARBY_MAX_RADIUS_M, geo_index
+from fastjson import FAST_SERIALIZATION, RowSerializer, dumps
+from metrics import (
+    METRICS_ENABLED,
+    MetricsMiddleware,
+    instrument_engine,
+    metrics_response,
+    observe_outbound,
+    register_stats,
+)
+from migrations import MIGRATIONS
+from schema import migrate
+from startup import FirstRequestMiddleware, StartupReport
+from token_cache import token_cache
 
 # --------------------------
 # CONFIG
@@ -20,7 +43,21 @@ from deps import get_db
 SECRET_KEY = os.getenv("SECRET_KEY", "SUPER_SECRET_KEY_CHANGE_ME")
 ALGORITHM = "HS256"
 
+# rental-service keeps a local hourly-rate cache; tell it when a rate changes
+RENTAL_URL = os.getenv("RENTAL_SERVICE_URL", "http://rental-service:8000")
+RATE_NOTIFY_TIMEOUT = float(os.getenv("RATE_NOTIFY_TIMEOUT", "2"))
+
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "500"))
+
+LIST_MAX_LIMIT = int(os.getenv("LIST_MAX_LIMIT", "1000"))
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "500"))
+
+equipment_list_adapter = TypeAdapter(List[schemas.EquipmentOut])
+equipment_rows = RowSerializer(models.Equipment, schemas.EquipmentOut)
+
 bearer = HTTPBearer()
+# EventSource cannot send headers, so the event stream also takes ?token=
+optional_bearer = HTTPBearer(auto_error=False)
 
 # --------------------------
 # AUTH MODELS
@@ -32,10 +69,10 @@ class TokenUser:
         self.role = role
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(bearer),
-) -> TokenUser:
-    token = credentials.credentials
+def decode_token(token: str) -> TokenUser:
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
 
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -44,10 +81,29 @@ def get_current_user(
     except jwt.PyJWTError:
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Invalid token")
 
-    return TokenUser(
+    user = TokenUser(
         user_id=int(payload["sub"]),
         role=payload["role"],
     )
+    token_cache.put(token, user, payload.get("exp"))
+    return user
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer),
+) -> TokenUser:
+    return decode_token(credentials.credentials)
+
+
+def get_stream_user(
+    token: Optional[str] = Query(default=None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer),
+) -> TokenUser:
+    if credentials is not None:
+        return decode_token(credentials.credentials)
+    if token:
+        return decode_token(token)
+    raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Not authenticated")
 
 
 def get_admin_user(current: TokenUser = Depends(get_current_user)) -> TokenUser:
@@ -63,13 +119,37 @@ def get_admin_user(current: TokenUser = Depends(get_current_user)) -> TokenUser:
 # APP INIT
 # --------------------------
 
+startup_report = StartupReport("inventory-service")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db_engine = require_engine()
+    with startup_report.phase("schema"):
+        startup_report.schema_from, startup_report.schema_to = migrate(db_engine, MIGRATIONS)
+    with startup_report.phase("geo_index"):
+        geo_index.load(load_geo_rows())
+    startup_report.ready()
+    yield
+
+
 app = FastAPI(
     title="Bike4You InventoryService",
     version="1.0.0",
     swagger_ui_parameters={"persistAuthorization": True},
+    lifespan=lifespan,
 )
 
-Base.metadata.create_all(bind=engine)
+# --------------------------
+# ADMISSION CONTROL
+# --------------------------
+# added before CORS so shed responses still carry CORS headers; event
+# streams stay open for minutes and would pin a slot each
+
+admission = AdmissionController(exempt=ADMISSION_EXEMPT + ("/equipment/events",))
+
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, controller=admission)
 
 # --------------------------
 # CORS
@@ -93,20 +173,181 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-After-Id", "ETag"],
 )
 
+# --------------------------
+# METRICS
+# --------------------------
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    if engine is not None:
+        instrument_engine(engine)
+    if async_engine is not None:
+        instrument_engine(async_engine.sync_engine)
+    register_stats("token_cache", token_cache.stats)
+    register_stats("catalog_cache", catalog_cache.stats)
+    register_stats("equipment_events", event_hub.stats)
+    register_stats("geo_index", geo_index.stats)
+    register_stats("admission", admission.stats)
+    register_stats("startup", startup_report.stats)
+
+app.add_middleware(FirstRequestMiddleware, report=startup_report)
+
+# --------------------------
+# HELPERS
+# --------------------------
+
+def notify_rate_change(equipment_id: int, hourly_rate: float, token: str) -> None:
+    if not RENTAL_URL:
+        return
+
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        response = httpx.post(
+            f"{RENTAL_URL}/rentals/rates/invalidate",
+            json={"equipment_id": equipment_id, "hourly_rate": hourly_rate},
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=RATE_NOTIFY_TIMEOUT,
+        )
+        outcome = str(response.status_code)
+    except httpx.HTTPError:
+        # the rental cache TTL bounds how long a stale rate can survive
+        pass
+    finally:
+        observe_outbound("rental", "invalidate_rate", outcome, started)
+
+
+def load_geo_rows():
+    # only what the index keeps: available items that have coordinates
+    db = SessionLocal()
+    try:
+        return db.query(
+            models.Equipment.id,
+            models.Equipment.type,
+            models.Equipment.status,
+            models.Equipment.latitude,
+            models.Equipment.longitude,
+        ).filter(
+            models.Equipment.status == "available",
+            models.Equipment.latitude.isnot(None),
+            models.Equipment.longitude.isnot(None),
+        ).all()
+    finally:
+        db.close()
+
+
+def apply_update(item: models.Equipment, update: schemas.EquipmentUpdate) -> bool:
+    """Copy the set fields of `update` onto `item`; return True if the rate changed."""
+    if update.status is not None:
+        item.status = update.status
+    if update.location is not None:
+        item.location = update.location
+    if update.image_url is not None:
+        item.image_url = update.image_url
+    if update.latitude is not None:
+        item.latitude = update.latitude
+    if update.longitude is not None:
+        item.longitude = update.longitude
+
+    rate_changed = (
+        update.hourly_rate is not None
+        and update.hourly_rate != item.hourly_rate
+    )
+    if update.hourly_rate is not None:
+        item.hourly_rate = update.hourly_rate
+
+    item.version = (item.version or 0) + 1
+
+    return rate_changed
+
+
+def transition_status(
+    db: Session,
+    equipment_id: int,
+    from_status: str,
+    to_status: str,
+    expected_version: Optional[int],
+):
+    """Single conditional UPDATE; returns the new row, or raises 404/409."""
+    stmt = (
+        update(models.Equipment)
+        .where(
+            models.Equipment.id == equipment_id,
+            models.Equipment.status == from_status,
+        )
+        .values(status=to_status, version=models.Equipment.version + 1)
+        .returning(
+            models.Equipment.id,
+            models.Equipment.type,
+            models.Equipment.status,
+            models.Equipment.location,
+            models.Equipment.hourly_rate,
+            models.Equipment.version,
+            models.Equipment.latitude,
+            models.Equipment.longitude,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if expected_version is not None:
+        stmt = stmt.where(models.Equipment.version == expected_version)
+
+    row = db.execute(stmt).first()
+    if row is not None:
+        db.commit()
+        return row._asdict()
+
+    db.rollback()
+    current = db.query(
+        models.Equipment.status,
+        models.Equipment.version,
+    ).filter(models.Equipment.id == equipment_id).first()
+
+    if current is None:
+        raise HTTPException(404, "Equipment not found")
+
+    if current.status == from_status:
+        message = f"Equipment version is {current.version}, expected {expected_version}"
+    else:
+        message = f"Equipment is {current.status}, expected {from_status}"
+
+    raise HTTPException(
+        status.HTTP_409_CONFLICT,
+        {
+            "message": message,
+            "status": current.status,
+            "version": current.version,
+        },
+    )
+
+
+def parse_ids(raw: str) -> List[int]:
+    try:
+        ids = [int(part) for part in raw.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(422, "ids must be a comma-separated list of integers")
+
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(422, f"At most {BATCH_MAX_IDS} ids per request")
+
+    # keep the caller's order, drop duplicates
+    return list(dict.fromkeys(ids))
+
+
 # --------------------------
 # ROUTES
 # --------------------------
 
-@app.get("/equipment", response_model=List[schemas.EquipmentOut])
-def list_equipment(
-    status: Optional[str] = Query(default=None),
-    type_: Optional[str] = Query(default=None, alias="type"),
-    db: Session = Depends(get_db),
-    user: TokenUser = Depends(get_current_user),
+def equipment_query(
+    db: Session,
+    status: Optional[str],
+    type_: Optional[str],
+    after_id: Optional[int],
+    columns: Optional[tuple] = None,
 ):
-    query = db.query(models.Equipment)
+    query = db.query(*columns) if columns else db.query(models.Equipment)
 
     if status is not None:
         query = query.filter(models.Equipment.status == status)
@@ -114,13 +355,91 @@ def list_equipment(
     if type_ is not None:
         query = query.filter(models.Equipment.type == type_)
 
-    return query.all()
+    if after_id is not None:
+        query = query.filter(models.Equipment.id > after_id)
+
+    return query.order_by(models.Equipment.id)
+
+
+def stream_equipment(
+    status: Optional[str],
+    type_: Optional[str],
+    after_id: Optional[int],
+    limit: Optional[int],
+):
+    # owns its session: the response body is produced after the handler returns
+    db = SessionLocal()
+    try:
+        columns = equipment_rows.columns if FAST_SERIALIZATION else None
+        query = equipment_query(db, status, type_, after_id, columns)
+        if limit is not None:
+            query = query.limit(limit)
+
+        rows = query.execution_options(stream_results=True).yield_per(STREAM_CHUNK_ROWS)
+        for item in rows:
+            if FAST_SERIALIZATION:
+                yield dumps(equipment_rows.one(item)) + b"\n"
+                continue
+            out = schemas.EquipmentOut.model_validate(item, from_attributes=True)
+            yield out.model_dump_json() + "\n"
+    finally:
+        db.close()
+
+
+@app.get("/equipment", response_model=List[schemas.EquipmentOut])
+async def list_equipment(
+    status: Optional[str] = Query(default=None),
+    type_: Optional[str] = Query(default=None, alias="type"),
+    after_id: Optional[int] = Query(default=None, ge=0),
+    limit: Optional[int] = Query(default=None, ge=1, le=LIST_MAX_LIMIT),
+    stream: bool = Query(default=False, description="Stream rows as NDJSON"),
+    if_none_match: Optional[str] = Header(default=None),
+    db: Database = Depends(get_db),
+    user: TokenUser = Depends(get_current_user),
+):
+    if stream:
+        return StreamingResponse(
+            stream_equipment(status, type_, after_id, limit),
+            media_type="application/x-ndjson",
+        )
+
+    def fetch(s):
+        columns = equipment_rows.columns if FAST_SERIALIZATION else None
+        query = equipment_query(s, status, type_, after_id, columns)
+        # without a limit the full list is returned, as before
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    key = (status, type_, after_id, limit)
+    snapshot = catalog_cache.get(key)
+
+    if snapshot is None:
+        generation = catalog_cache.generation
+        items = await db.run(fetch)
+        if FAST_SERIALIZATION:
+            body = dumps(equipment_rows(items))
+        else:
+            body = equipment_list_adapter.dump_json(
+                equipment_list_adapter.validate_python(items, from_attributes=True)
+            )
+        next_after_id = items[-1].id if limit is not None and len(items) == limit else None
+        snapshot = catalog_cache.put(key, generation, body, next_after_id)
+
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if snapshot.next_after_id is not None:
+        headers["X-Next-After-Id"] = str(snapshot.next_after_id)
+
+    if etag_matches(if_none_match, snapshot.etag):
+        return Response(status_code=304, headers=headers)
+
+    return Response(snapshot.body, media_type="application/json", headers=headers)
 
 
 @app.post("/equipment/add", response_model=schemas.EquipmentOut)
-def add_equipment(
+async def add_equipment(
     data: schemas.EquipmentCreate,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     admin: TokenUser = Depends(get_admin_user),
 ):
     item = models.Equipment(
@@ -129,49 +448,240 @@ def add_equipment(
         location=data.location,
         image_url=data.image_url,
         hourly_rate=data.hourly_rate,
+        latitude=data.latitude,
+        longitude=data.longitude,
     )
     db.add(item)
-    db.commit()
-    db.refresh(item)
+    await db.commit()
+    await db.refresh(item)
+    catalog_cache.invalidate()
+    geo_index.update(item)
+    event_hub.publish(equipment_event(item))
     return item
 
 
 @app.post("/equipment/update", response_model=schemas.EquipmentOut)
-def update_equipment(
+async def update_equipment(
     update: schemas.EquipmentUpdate,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: Database = Depends(get_db),
     admin: TokenUser = Depends(get_admin_user),
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
 ):
-    item = db.query(models.Equipment).filter(
-        models.Equipment.id == update.id
-    ).first()
+    item = await db.run(
+        lambda s: s.query(models.Equipment).filter(
+            models.Equipment.id == update.id
+        ).first()
+    )
 
     if not item:
         raise HTTPException(404, "Equipment not found")
 
-    if update.status is not None:
-        item.status = update.status
-    if update.location is not None:
-        item.location = update.location
-    if update.image_url is not None:
-        item.image_url = update.image_url
-    if update.hourly_rate is not None:
-        item.hourly_rate = update.hourly_rate
+    rate_changed = apply_update(item, update)
+
+    await db.commit()
+    await db.refresh(item)
+    catalog_cache.invalidate()
+    geo_index.update(item)
+    event_hub.publish(equipment_event(item))
+
+    if rate_changed:
+        background_tasks.add_task(
+            notify_rate_change,
+            item.id,
+            item.hourly_rate,
+            creds.credentials,
+        )
 
-    db.commit()
-    db.refresh(item)
     return item
 
 
+@app.post("/equipment/bulk-update", response_model=schemas.EquipmentBulkResult)
+async def bulk_update_equipment(
+    data: schemas.EquipmentBulkUpdate,
+    background_tasks: BackgroundTasks,
+    db: Database = Depends(get_db),
+    admin: TokenUser = Depends(get_admin_user),
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
+):
+    ids = {update.id for update in data.items}
+    rows = await db.run(
+        lambda s: s.query(models.Equipment).filter(
+            models.Equipment.id.in_(ids)
+        ).all()
+    )
+    items = {item.id: item for item in rows}
+
+    rate_changed = set()
+    for update in data.items:
+        item = items.get(update.id)
+        if item is not None and apply_update(item, update):
+            rate_changed.add(item.id)
+
+    await db.commit()
+    catalog_cache.invalidate()
+    for item in rows:
+        geo_index.update(item)
+        event_hub.publish(equipment_event(item))
+
+    results = []
+    for update in data.items:
+        item = items.get(update.id)
+        if item is None:
+            results.append(
+                {"id": update.id, "ok": False, "error": "Equipment not found"}
+            )
+        else:
+            results.append({"id": update.id, "ok": True, "item": item})
+
+    for equipment_id in rate_changed:
+        background_tasks.add_task(
+            notify_rate_change,
+            equipment_id,
+            items[equipment_id].hourly_rate,
+            creds.credentials,
+        )
+
+    return {
+        "results": results,
+        "updated": len(items),
+        "not_found": len(ids) - len(items),
+    }
+
+
+@app.get("/equipment/events")
+async def equipment_events(
+    type_: Optional[str] = Query(default=None, alias="type"),
+    location: Optional[str] = Query(default=None),
+    user: TokenUser = Depends(get_stream_user),
+):
+    subscriber = event_hub.subscribe(type_, location)
+    if subscriber is None:
+        raise HTTPException(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            "Too many event subscribers",
+            headers={"Retry-After": "5"},
+        )
+
+    return StreamingResponse(
+        event_hub.stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/equipment/events/stats", response_model=schemas.EventStats)
+async def equipment_events_stats(admin: TokenUser = Depends(get_admin_user)):
+    return event_hub.stats()
+
+
+@app.get("/equipment/nearby", response_model=List[schemas.EquipmentNearby])
+async def nearby_equipment(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(default=1000, gt=0, le=NEARBY_MAX_RADIUS_M, description="Meters"),
+    type_: Optional[str] = Query(default=None, alias="type"),
+    limit: int = Query(default=20, ge=1, le=BATCH_MAX_IDS),
+    db: Database = Depends(get_db),
+    user: TokenUser = Depends(get_current_user),
+):
+    # the grid picks candidates from nearby cells; one primary-key read returns the rows
+    hits = geo_index.nearby(lat, lon, radius, type_, limit)
+    if not hits:
+        return []
+
+    rows = await db.run(
+        lambda s: s.query(models.Equipment).filter(
+            models.Equipment.id.in_([equipment_id for equipment_id, _ in hits]),
+            models.Equipment.status == "available",
+        ).all()
+    )
+    found = {item.id: item for item in rows}
+
+    return [
+        schemas.EquipmentNearby(
+            **schemas.EquipmentOut.model_validate(found[equipment_id]).model_dump(),
+            distance_m=round(distance, 1),
+        )
+        for equipment_id, distance in hits
+        if equipment_id in found
+    ]
+
+
+@app.get("/equipment/batch", response_model=schemas.EquipmentBatch)
+async def get_equipment_batch(
+    ids: str = Query(..., description="Comma-separated equipment ids"),
+    db: Database = Depends(get_db),
+    user: TokenUser = Depends(get_current_user),
+):
+    wanted = parse_ids(ids)
+    rows = await db.run(
+        lambda s: s.query(models.Equipment).filter(
+            models.Equipment.id.in_(wanted)
+        ).all()
+    )
+    found = {item.id: item for item in rows}
+
+    return {
+        "items": [found[i] for i in wanted if i in found],
+        "missing": [i for i in wanted if i not in found],
+    }
+
+
+@app.post("/equipment/{equipment_id}/reserve", response_model=schemas.EquipmentReservation)
+async def reserve_equipment(
+    equipment_id: int,
+    data: Optional[schemas.EquipmentTransition] = None,
+    db: Database = Depends(get_db),
+    admin: TokenUser = Depends(get_admin_user),
+):
+    # rental-service reserves with its service identity; end users go through /rentals/start
+    expected_version = data.expected_version if data else None
+    reservation = await db.run(
+        transition_status,
+        equipment_id,
+        "available",
+        "rented",
+        expected_version,
+    )
+    catalog_cache.invalidate()
+    geo_index.update(reservation)
+    event_hub.publish(equipment_event(reservation))
+    return reservation
+
+
+@app.post("/equipment/{equipment_id}/release", response_model=schemas.EquipmentReservation)
+async def release_equipment(
+    equipment_id: int,
+    data: Optional[schemas.EquipmentTransition] = None,
+    db: Database = Depends(get_db),
+    admin: TokenUser = Depends(get_admin_user),
+):
+    expected_version = data.expected_version if data else None
+    reservation = await db.run(
+        transition_status,
+        equipment_id,
+        "rented",
+        "available",
+        expected_version,
+    )
+    catalog_cache.invalidate()
+    geo_index.update(reservation)
+    event_hub.publish(equipment_event(reservation))
+    return reservation
+
+
 @app.get("/equipment/{equipment_id}", response_model=schemas.EquipmentOut)
-def get_equipment(
+async def get_equipment(
     equipment_id: int,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     user: TokenUser = Depends(get_current_user),
 ):
-    item = db.query(models.Equipment).filter(
-        models.Equipment.id == equipment_id
-    ).first()
+    item = await db.run(
+        lambda s: s.query(models.Equipment).filter(
+            models.Equipment.id == equipment_id
+        ).first()
+    )
 
     if not item:
         raise HTTPException(404, "Equipment not found")
@@ -184,6 +694,16 @@ def health():
     return {"status": "ok", "service": "inventory-service"}
 
 
+@app.get("/health/startup", include_in_schema=False)
+def startup_health():
+    return startup_report.as_dict()
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return metrics_response()
+
+
 # --------------------------
 # CUSTOM OPENAPI (Swagger Bearer)
 # --------------------------
@@ -215,3 +735,6 @@ def custom_openapi():
 
 
 app.openapi = custom_openapi
+
+
+startup_report.mark("imported")
@@ -0,0 +1,197 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from starlette.responses import Response
+
+# --------------------------
+# CONFIG
+# --------------------------
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# per-request cost of the middleware plus DB hooks, checked by
+# benchmarks/metrics_overhead_bench.py
+METRICS_OVERHEAD_BUDGET_US = float(os.getenv("METRICS_OVERHEAD_BUDGET_US", "100"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+# --------------------------
+# METRICS
+# --------------------------
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests currently being served, including open streams",
+)
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed while serving one request",
+    ["route"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds",
+    "Total SQL time while serving one request",
+    ["route"],
+    buckets=DB_BUCKETS,
+)
+DB_QUERIES_OUTSIDE_REQUESTS = Counter(
+    "db_queries_outside_requests_total",
+    "SQL statements run by background work",
+)
+
+OUTBOUND_LATENCY = Histogram(
+    "http_client_request_duration_seconds",
+    "Latency of calls to other services",
+    ["target", "operation", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+_request_children: Dict[Tuple[str, str, int], Tuple] = {}
+
+
+def _children(method: str, route: str, status_code: int) -> Tuple:
+    # .labels() validates and locks on every call; resolve each combination once
+    key = (method, route, status_code)
+    children = _request_children.get(key)
+    if children is None:
+        children = (
+            REQUEST_LATENCY.labels(method, route, status_code),
+            DB_QUERIES_PER_REQUEST.labels(route),
+            DB_TIME_PER_REQUEST.labels(route),
+        )
+        _request_children[key] = children
+    return children
+
+
+class QueryUsage:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# set per request by the middleware; run_in_threadpool and the async
+# session's greenlets both carry the context, so hooks see the right one
+_query_usage: ContextVar[Optional[QueryUsage]] = ContextVar("query_usage", default=None)
+
+
+# --------------------------
+# ASGI MIDDLEWARE
+# --------------------------
+
+class MetricsMiddleware:
+    """Times every HTTP request and attributes its SQL work to the route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        usage = QueryUsage()
+        token = _query_usage.set(usage)
+        REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_FLIGHT.dec()
+            _query_usage.reset(token)
+
+            # label by template, not raw path, to keep cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            latency, queries, db_time = _children(scope["method"], route, status_code)
+            latency.observe(elapsed)
+            queries.observe(usage.count)
+            db_time.observe(usage.seconds)
+
+
+# --------------------------
+# SQLALCHEMY HOOKS
+# --------------------------
+
+def instrument_engine(sync_engine) -> None:
+    """Count and time statements; pass `async_engine.sync_engine` for async engines."""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        usage = _query_usage.get()
+        if usage is None:
+            DB_QUERIES_OUTSIDE_REQUESTS.inc()
+            return
+        usage.count += 1
+        usage.seconds += time.perf_counter() - context._metrics_started
+
+
+# --------------------------
+# OUTBOUND CALLS
+# --------------------------
+
+def observe_outbound(target: str, operation: str, status: str, started: float) -> None:
+    OUTBOUND_LATENCY.labels(target, operation, status).observe(time.perf_counter() - started)
+
+
+# --------------------------
+# EXISTING STATS
+# --------------------------
+
+class StatsCollector:
+    """Exposes the numeric fields of an in-process `stats()` dict as gauges."""
+
+    def __init__(self, prefix: str, fn: Callable[[], dict]):
+        self.prefix = prefix
+        self.fn = fn
+
+    def collect(self):
+        for key, value in self.fn().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            yield GaugeMetricFamily(f"{self.prefix}_{key}", f"{self.prefix} {key}", value=value)
+
+
+def register_stats(prefix: str, fn: Callable[[], dict]) -> None:
+    REGISTRY.register(StatsCollector(prefix, fn))
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
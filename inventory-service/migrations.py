@@ -0,0 +1,29 @@
+import models
+from database import Base
+from schema import Migration, add_column, create_indexes
+
+
+def create_tables(conn) -> None:
+    # creates whatever is missing from the current models; existing tables are left alone
+    Base.metadata.create_all(bind=conn)
+
+
+def equipment_version(conn) -> None:
+    add_column(conn, "equipment", "version", "INTEGER NOT NULL DEFAULT 0")
+
+
+def equipment_indexes(conn) -> None:
+    create_indexes(conn, models.Equipment.__table__)
+
+
+def equipment_coordinates(conn) -> None:
+    add_column(conn, "equipment", "latitude", "FLOAT")
+    add_column(conn, "equipment", "longitude", "FLOAT")
+
+
+MIGRATIONS = [
+    Migration(1, "create tables", create_tables),
+    Migration(2, "equipment.version", equipment_version),
+    Migration(3, "equipment indexes", equipment_indexes),
+    Migration(4, "equipment.latitude, equipment.longitude", equipment_coordinates),
+]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float
+from sqlalchemy import Column, Integer, String, DateTime, Float, Index
 from datetime import datetime
 from database import Base
 
@@ -13,3 +13,11 @@ class Equipment(Base):
     image_url = Column(String, nullable=True)
     hourly_rate = Column(Float, nullable=False, default=4.0)  # ← Новое поле
     created_at = Column(DateTime, default=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=0)  # bumped on every change, for compare-and-set
+    latitude = Column(Float, nullable=True)   # optional; only items with both are found by /equipment/nearby
+    longitude = Column(Float, nullable=True)
+
+    __table_args__ = (
+        # serves list_equipment filters and its keyset (id) ordering
+        Index("ix_equipment_status_type_id", "status", "type", "id"),
+    )
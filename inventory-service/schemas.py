@@ -1,6 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+import os
+
+# one bulk request is one write transaction and one event per row
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "500"))
 
 
 class EquipmentBase(BaseModel):
@@ -9,6 +13,8 @@ class EquipmentBase(BaseModel):
     location: str
     image_url: Optional[str] = None
     hourly_rate: float  # ← Добавили
+    latitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    longitude: Optional[float] = Field(default=None, ge=-180, le=180)
 
 
 class EquipmentCreate(EquipmentBase):
@@ -21,11 +27,58 @@ class EquipmentUpdate(BaseModel):
     location: Optional[str] = None
     image_url: Optional[str] = None
     hourly_rate: Optional[float] = None  # ← Разрешаем обновлять тариф
+    latitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    longitude: Optional[float] = Field(default=None, ge=-180, le=180)
 
 
 class EquipmentOut(EquipmentBase):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     created_at: datetime
+    version: int = 0
+
+
+class EquipmentNearby(EquipmentOut):
+    distance_m: float
+
+
+class EquipmentBatch(BaseModel):
+    items: List[EquipmentOut]
+    missing: List[int]
+
+
+class EquipmentBulkUpdate(BaseModel):
+    items: List[EquipmentUpdate] = Field(max_length=BULK_MAX_ITEMS)
+
+
+class EquipmentBulkItemResult(BaseModel):
+    id: int
+    ok: bool
+    item: Optional[EquipmentOut] = None
+    error: Optional[str] = None
+
+
+class EquipmentBulkResult(BaseModel):
+    results: List[EquipmentBulkItemResult]
+    updated: int
+    not_found: int
+
+
+class EquipmentTransition(BaseModel):
+    # optional compare-and-set guard against a version read earlier
+    expected_version: Optional[int] = None
+
+
+class EquipmentReservation(BaseModel):
+    id: int
+    type: str
+    status: str
+    hourly_rate: float
+    version: int
+
 
-    class Config:
-        orm_mode = True
+class EventStats(BaseModel):
+    subscribers: int
+    published_total: int
+    dropped_total: int
@@ -0,0 +1,177 @@
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import extract, func, insert, select
+from sqlalchemy.orm import Session
+
+import models
+
+Rollup = models.RentalRollup
+
+ANALYTICS_DEFAULT_DAYS = 30
+
+
+# --------------------------
+# WRITE SIDE
+# --------------------------
+
+def _upsert(db: Session):
+    # both supported backends speak INSERT ... ON CONFLICT DO UPDATE
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(Rollup)
+
+
+def record_rental(
+    db: Session,
+    equipment_id: int,
+    equipment_type: Optional[str],
+    start_time: datetime,
+    minutes: int,
+    revenue: float,
+) -> None:
+    """Fold one completed rental into its rollup row, in the caller's transaction."""
+    stmt = _upsert(db).values(
+        day=start_time.date(),
+        hour=start_time.hour,
+        equipment_id=equipment_id,
+        equipment_type=equipment_type,
+        rentals=1,
+        minutes=minutes,
+        revenue=revenue,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Rollup.day, Rollup.hour, Rollup.equipment_id],
+        set_={
+            "rentals": Rollup.rentals + 1,
+            "minutes": Rollup.minutes + stmt.excluded.minutes,
+            "revenue": Rollup.revenue + stmt.excluded.revenue,
+            "equipment_type": func.coalesce(stmt.excluded.equipment_type, Rollup.equipment_type),
+        },
+    )
+    db.execute(stmt)
+
+
+def rebuild(db: Session) -> int:
+    """Recompute every rollup row from rental history in one GROUP BY pass."""
+    R = models.Rental
+    day = func.date(R.start_time)
+    hour = extract("hour", R.start_time)
+
+    grouped = (
+        select(
+            day,
+            hour,
+            R.equipment_id,
+            func.max(R.equipment_type),
+            func.count(R.id),
+            func.coalesce(func.sum(R.total_minutes), 0),
+            # revenue includes the penalty settled at return, as record_rental does
+            func.coalesce(func.sum(R.total_price + func.coalesce(R.penalty_eur, 0.0)), 0.0),
+        )
+        .where(R.status == "completed")
+        .group_by(day, hour, R.equipment_id)
+    )
+
+    db.query(Rollup).delete(synchronize_session=False)
+    db.execute(
+        insert(Rollup).from_select(
+            [
+                Rollup.day,
+                Rollup.hour,
+                Rollup.equipment_id,
+                Rollup.equipment_type,
+                Rollup.rentals,
+                Rollup.minutes,
+                Rollup.revenue,
+            ],
+            grouped,
+        )
+    )
+    db.commit()
+    return db.query(func.count()).select_from(Rollup).scalar()
+
+
+# --------------------------
+# READ SIDE
+# --------------------------
+
+def period(date_from: Optional[date], date_to: Optional[date]):
+    date_to = date_to or datetime.utcnow().date()
+    date_from = date_from or date_to - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    return date_from, date_to
+
+
+def revenue(db: Session, group_by: str, date_from: date, date_to: date) -> List[dict]:
+    key = {
+        "day": Rollup.day,
+        "equipment": Rollup.equipment_id,
+        "type": func.coalesce(Rollup.equipment_type, "unknown"),
+    }[group_by]
+
+    rows = (
+        db.query(
+            key,
+            func.sum(Rollup.rentals),
+            func.sum(Rollup.minutes),
+            func.sum(Rollup.revenue),
+        )
+        .filter(Rollup.day >= date_from, Rollup.day <= date_to)
+        .group_by(key)
+        .order_by(key)
+        .all()
+    )
+    return [
+        {"key": str(k), "rentals": r, "minutes": m, "revenue": round(v, 2)}
+        for k, r, m, v in rows
+    ]
+
+
+def utilization(
+    db: Session,
+    date_from: date,
+    date_to: date,
+    fleet_size: Optional[int],
+) -> dict:
+    rows = (
+        db.query(Rollup.equipment_id, func.sum(Rollup.minutes))
+        .filter(Rollup.day >= date_from, Rollup.day <= date_to)
+        .group_by(Rollup.equipment_id)
+        .order_by(Rollup.equipment_id)
+        .all()
+    )
+
+    period_minutes = ((date_to - date_from).days + 1) * 24 * 60
+    # without an explicit fleet size, count equipment rented at least once
+    fleet = fleet_size or len(rows)
+    rented = sum(minutes for _, minutes in rows)
+
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "period_minutes": period_minutes,
+        "fleet_size": fleet,
+        "rented_minutes": rented,
+        "utilization_pct": round(rented / (fleet * period_minutes) * 100, 2) if fleet else 0.0,
+        "per_equipment": [
+            {
+                "equipment_id": equipment_id,
+                "rented_minutes": minutes,
+                "utilization_pct": round(minutes / period_minutes * 100, 2),
+            }
+            for equipment_id, minutes in rows
+        ],
+    }
+
+
+def peak_hours(db: Session, date_from: date, date_to: date) -> List[dict]:
+    rows = (
+        db.query(Rollup.hour, func.sum(Rollup.rentals))
+        .filter(Rollup.day >= date_from, Rollup.day <= date_to)
+        .group_by(Rollup.hour)
+        .all()
+    )
+    counts = dict(rows)
+    return [{"hour": hour, "rentals": counts.get(hour, 0)} for hour in range(24)]
@@ -0,0 +1,70 @@
+import os
+import time
+from typing import List, Optional
+
+import httpx
+
+from metrics import observe_outbound
+
+# --------------------------
+# CONFIG
+# --------------------------
+
+AUTH_URL = os.getenv(
+    "AUTH_SERVICE_URL",
+    "http://auth-service:8000",
+)
+
+AUTH_TIMEOUT = float(os.getenv("AUTH_TIMEOUT", "3"))
+AUTH_CONNECT_TIMEOUT = float(os.getenv("AUTH_CONNECT_TIMEOUT", "1"))
+AUTH_MAX_CONNECTIONS = int(os.getenv("AUTH_MAX_CONNECTIONS", "20"))
+
+
+# --------------------------
+# CLIENT
+# --------------------------
+
+class AuthClient:
+    """Application-scoped pooled client for auth-service calls."""
+
+    def __init__(self, base_url: str = AUTH_URL):
+        self.base_url = base_url
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> None:
+        if self._client is not None:
+            return
+
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(max_connections=AUTH_MAX_CONNECTIONS),
+            timeout=httpx.Timeout(AUTH_TIMEOUT, connect=AUTH_CONNECT_TIMEOUT),
+        )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError("AuthClient is not started")
+        return self._client
+
+    async def get_users(self, user_ids: List[int], token: str) -> httpx.Response:
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self.client.get(
+                "/auth/users",
+                params={"ids": ",".join(map(str, user_ids))},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            outcome = str(response.status_code)
+            return response
+        finally:
+            observe_outbound("auth", "get_users", outcome, started)
+
+
+auth = AuthClient()
@@ -1,10 +1,46 @@
-from database import SessionLocal
+from typing import Callable, TypeVar
+
+from database import AsyncSessionLocal, SessionLocal
 from sqlalchemy.orm import Session
-from fastapi import Depends
+from starlette.concurrency import run_in_threadpool
+
+T = TypeVar("T")
+
+
+class Database:
+    """Request-scoped session handle shared by the async and sync DB modes.
+
+    Routes pass plain functions over a sync ``Session`` to ``run``. In async
+    mode they execute through ``AsyncSession.run_sync`` on the async driver;
+    in sync mode they are offloaded to the threadpool.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def add(self, obj) -> None:
+        self.session.add(obj)
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        if AsyncSessionLocal is not None:
+            return await self.session.run_sync(fn, *args)
+        return await run_in_threadpool(fn, self.session, *args)
+
+    async def commit(self) -> None:
+        await self.run(Session.commit)
+
+    async def refresh(self, obj) -> None:
+        await self.run(Session.refresh, obj)
+
+
+async def get_db():
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            yield Database(session)
+        return
 
-def get_db() -> Session:
     db = SessionLocal()
     try:
-        yield db
+        yield Database(db)
     finally:
-        db.close()
+        await run_in_threadpool(db.close)
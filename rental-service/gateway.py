@@ -0,0 +1,226 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import httpx
+from fastapi import HTTPException, status
+
+from auth_client import auth
+from inventory_client import inventory
+
+# --------------------------
+# CONFIG
+# --------------------------
+
+# short on purpose: enriched views may lag a status or role change by this much
+ENRICH_CACHE_TTL = float(os.getenv("ENRICH_CACHE_TTL", "5"))
+ENRICH_CACHE_SIZE = int(os.getenv("ENRICH_CACHE_SIZE", "10000"))
+# must stay within the upstream BATCH_MAX_IDS / USERS_BATCH_MAX_IDS
+ENRICH_BATCH_SIZE = int(os.getenv("ENRICH_BATCH_SIZE", "200"))
+
+EQUIPMENT_FIELDS = ("id", "type", "status", "location", "hourly_rate", "image_url")
+USER_FIELDS = ("id", "name", "email", "role")
+
+# cached "upstream says it does not exist", so deleted ids are not refetched every page
+_MISSING = object()
+
+Fetch = Callable[[List[int], str], Awaitable[Dict[int, dict]]]
+
+
+# --------------------------
+# LOADER
+# --------------------------
+
+class EntityLoader:
+    """Batched, coalesced and briefly cached lookups of one upstream entity.
+
+    `load_many` dedupes ids, serves what it can from the cache, joins loads
+    already in flight for the rest and fetches the remainder in concurrent
+    batches. Only admin callers use it, so a result loaded with one admin's
+    token is shared with the others.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Fetch,
+        ttl: float = ENRICH_CACHE_TTL,
+        maxsize: int = ENRICH_CACHE_SIZE,
+        batch_size: int = ENRICH_BATCH_SIZE,
+    ):
+        self.name = name
+        self.fetch = fetch
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self._entries: "OrderedDict[int, Tuple[object, float]]" = OrderedDict()
+        self._inflight: Dict[int, asyncio.Future] = {}
+        # the loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.batches = 0
+
+    def _peek(self, entity_id: int):
+        entry = self._entries.get(entity_id)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[entity_id]
+            return None
+
+        self._entries.move_to_end(entity_id)
+        return value
+
+    def _put(self, entity_id: int, value) -> None:
+        if self.maxsize <= 0:
+            return
+
+        self._entries[entity_id] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(entity_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, entity_id: Optional[int] = None) -> None:
+        if entity_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(entity_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+        }
+
+    async def _load_batch(self, ids: List[int], token: str) -> None:
+        # runs as its own task: the outcome reaches callers only through the futures
+        futures = [self._inflight[i] for i in ids]
+        self.batches += 1
+        try:
+            found = await self.fetch(ids, token)
+        except asyncio.CancelledError:
+            for future in futures:
+                future.cancel()
+        except Exception as exc:
+            for future in futures:
+                future.set_exception(exc)
+                # waiters re-raise it; mark retrieved so an unawaited one does not warn
+                future.exception()
+        else:
+            for entity_id, future in zip(ids, futures):
+                value = found.get(entity_id, _MISSING)
+                self._put(entity_id, value)
+                future.set_result(value)
+        finally:
+            for entity_id in ids:
+                self._inflight.pop(entity_id, None)
+
+    async def load_many(self, ids: Iterable[int], token: str) -> Dict[int, Optional[dict]]:
+        values: Dict[int, object] = {}
+        waiting: Dict[int, asyncio.Future] = {}
+        wanted: List[int] = []
+
+        for entity_id in dict.fromkeys(ids):
+            value = self._peek(entity_id)
+            if value is not None:
+                self.hits += 1
+                values[entity_id] = value
+                continue
+
+            self.misses += 1
+            pending = self._inflight.get(entity_id)
+            if pending is not None:
+                self.coalesced += 1
+                waiting[entity_id] = pending
+            else:
+                wanted.append(entity_id)
+
+        loop = asyncio.get_running_loop()
+        for entity_id in wanted:
+            waiting[entity_id] = self._inflight[entity_id] = loop.create_future()
+
+        # batches are tasks rather than awaited inline, so a caller that goes
+        # away does not cancel a load other requests have joined
+        for i in range(0, len(wanted), self.batch_size):
+            task = asyncio.ensure_future(self._load_batch(wanted[i:i + self.batch_size], token))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        for entity_id, future in waiting.items():
+            values[entity_id] = await asyncio.shield(future)
+
+        return {
+            entity_id: None if value is _MISSING else value
+            for entity_id, value in values.items()
+        }
+
+
+# --------------------------
+# UPSTREAMS
+# --------------------------
+
+def _summaries(items: List[dict], fields: Tuple[str, ...]) -> Dict[int, dict]:
+    return {item["id"]: {name: item.get(name) for name in fields} for item in items}
+
+
+async def fetch_equipment(ids: List[int], token: str) -> Dict[int, dict]:
+    try:
+        resp = await inventory.get_equipment_batch(ids, token)
+    except httpx.HTTPError:
+        resp = None
+
+    if resp is None or resp.status_code != 200:
+        raise HTTPException(
+            status.HTTP_502_BAD_GATEWAY,
+            "Inventory service unavailable",
+        )
+
+    return _summaries(resp.json()["items"], EQUIPMENT_FIELDS)
+
+
+async def fetch_users(ids: List[int], token: str) -> Dict[int, dict]:
+    try:
+        resp = await auth.get_users(ids, token)
+    except httpx.HTTPError:
+        resp = None
+
+    if resp is None or resp.status_code != 200:
+        raise HTTPException(
+            status.HTTP_502_BAD_GATEWAY,
+            "Auth service unavailable",
+        )
+
+    return _summaries(resp.json()["items"], USER_FIELDS)
+
+
+equipment_loader = EntityLoader("equipment", fetch_equipment)
+user_loader = EntityLoader("users", fetch_users)
+
+
+async def enrich(rentals: List[dict], token: str) -> List[dict]:
+    """Attach `equipment` and `user` summaries to rental dicts, in place.
+
+    Both upstreams are queried concurrently, at most one batch call per
+    ENRICH_BATCH_SIZE distinct ids each. An id the upstream no longer knows
+    gets None rather than failing the page.
+    """
+    equipment, users = await asyncio.gather(
+        equipment_loader.load_many((r["equipment_id"] for r in rentals), token),
+        user_loader.load_many((r["user_id"] for r in rentals), token),
+    )
+
+    for rental in rentals:
+        rental["equipment"] = equipment.get(rental["equipment_id"])
+        rental["user"] = users.get(rental["user_id"])
+    return rentals
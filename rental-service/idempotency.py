@@ -0,0 +1,346 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.responses import Response
+
+import models
+from deps import Database
+
+# --------------------------
+# CONFIG
+# --------------------------
+
+# how long a key is remembered; retries after that run again
+IDEMPOTENCY_KEY_TTL = float(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_CACHE_TTL = float(os.getenv("IDEMPOTENCY_CACHE_TTL", "600"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# a pending claim older than this is taken to be from a crashed request
+IDEMPOTENCY_PENDING_TIMEOUT = float(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT", "30"))
+# a duplicate held by another instance is polled for at most this long
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "10"))
+IDEMPOTENCY_POLL_INTERVAL = float(os.getenv("IDEMPOTENCY_POLL_INTERVAL", "0.1"))
+IDEMPOTENCY_PRUNE_INTERVAL = float(os.getenv("IDEMPOTENCY_PRUNE_INTERVAL", "300"))
+
+PENDING = "pending"
+COMPLETED = "completed"
+
+
+class StoredResponse:
+    __slots__ = ("fingerprint", "status_code", "body")
+
+    def __init__(self, fingerprint: str, status_code: int, body: str):
+        self.fingerprint = fingerprint
+        self.status_code = status_code
+        self.body = body
+
+
+class ActiveKey:
+    """The key the running handler was claimed under; see complete_in."""
+
+    __slots__ = ("key", "fingerprint", "response_model", "stored")
+
+    def __init__(self, key: str, fingerprint: str, response_model: Type[BaseModel]):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.response_model = response_model
+        self.stored: Optional[StoredResponse] = None
+
+
+_active_key: ContextVar[Optional[ActiveKey]] = ContextVar("idempotency_active_key", default=None)
+
+
+# --------------------------
+# DB SIDE
+# --------------------------
+# Plain functions over a sync Session, run through Database.run.
+
+def _stored(row: models.IdempotencyKey) -> Optional[StoredResponse]:
+    if row.status != COMPLETED:
+        return None
+    return StoredResponse(row.fingerprint, row.status_code, row.response)
+
+
+def _claim(s: Session, key: str, fingerprint: str) -> Tuple[bool, Optional[models.IdempotencyKey]]:
+    """Insert a pending row for `key`; returns (claimed, existing row)."""
+    now = datetime.utcnow()
+    s.add(models.IdempotencyKey(key=key, fingerprint=fingerprint, status=PENDING, created_at=now))
+    try:
+        s.commit()
+        return True, None
+    except IntegrityError:
+        s.rollback()
+
+    row = s.get(models.IdempotencyKey, key)
+    if row is None:
+        # the holder failed and dropped its claim in between
+        return _claim(s, key, fingerprint)
+
+    expired = row.created_at < now - timedelta(seconds=IDEMPOTENCY_KEY_TTL)
+    abandoned = row.status == PENDING and row.created_at < now - timedelta(seconds=IDEMPOTENCY_PENDING_TIMEOUT)
+    if not (expired or abandoned):
+        return False, row
+
+    # conditional on the old created_at, so only one instance takes it over
+    taken = s.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.key == key,
+        models.IdempotencyKey.created_at == row.created_at,
+    ).update(
+        {"fingerprint": fingerprint, "status": PENDING, "status_code": None, "response": None, "created_at": now},
+        synchronize_session=False,
+    )
+    s.commit()
+    if taken:
+        return True, None
+    s.expire(row)
+    return False, s.get(models.IdempotencyKey, key)
+
+
+def _complete(s: Session, key: str, stored: StoredResponse) -> None:
+    s.query(models.IdempotencyKey).filter(models.IdempotencyKey.key == key).update(
+        {"status": COMPLETED, "status_code": stored.status_code, "response": stored.body},
+        synchronize_session=False,
+    )
+    s.commit()
+
+
+def complete_in(s: Session, result) -> None:
+    """Complete the current request's key inside the handler's own transaction.
+
+    Call with the flushed result right before the handler commits, so the
+    key and the work it guards commit together: a crash in between can no
+    longer leave the work done and the key pending for a retry to redo.
+    A no-op for requests without an Idempotency-Key.
+    """
+    active = _active_key.get()
+    if active is None:
+        return
+
+    stored = StoredResponse(
+        active.fingerprint,
+        200,
+        active.response_model.model_validate(result).model_dump_json(),
+    )
+    s.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.key == active.key,
+        models.IdempotencyKey.status == PENDING,
+    ).update(
+        {"status": COMPLETED, "status_code": stored.status_code, "response": stored.body},
+        synchronize_session=False,
+    )
+    active.stored = stored
+
+
+def _release(s: Session, key: str) -> None:
+    # the request failed: drop the claim so a retry runs it again
+    s.rollback()
+    s.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.key == key,
+        models.IdempotencyKey.status == PENDING,
+    ).delete(synchronize_session=False)
+    s.commit()
+
+
+def _lookup(s: Session, key: str) -> Optional[models.IdempotencyKey]:
+    s.expire_all()
+    return s.get(models.IdempotencyKey, key)
+
+
+def _prune(s: Session) -> int:
+    cutoff = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_KEY_TTL)
+    deleted = s.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.created_at < cutoff,
+    ).delete(synchronize_session=False)
+    s.commit()
+    return deleted
+
+
+# --------------------------
+# STORE
+# --------------------------
+
+class IdempotencyStore:
+    """Replays the first successful response for a repeated Idempotency-Key.
+
+    Completed responses live in the idempotency_keys table and in a hot
+    LRU+TTL cache in front of it. A duplicate arriving while the first is
+    still running waits on it: through an in-process future on the same
+    instance, by polling the pending row on another. Only successful
+    responses are stored; a failed request releases its key.
+
+    Handlers should call complete_in before their commit. One that does not
+    is completed in a separate commit afterwards; if the process dies in
+    between, its key is taken over after IDEMPOTENCY_PENDING_TIMEOUT and a
+    retry runs the handler again.
+    """
+
+    def __init__(self, maxsize: int = IDEMPOTENCY_CACHE_SIZE, ttl: float = IDEMPOTENCY_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[StoredResponse, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._last_prune = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.replays = 0
+        self.waited = 0
+        self.conflicts = 0
+
+    def _peek(self, key: str) -> Optional[StoredResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        stored, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return stored
+
+    def _put(self, key: str, stored: StoredResponse) -> None:
+        self._entries[key] = (stored, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "replays": self.replays,
+            "waited": self.waited,
+            "conflicts": self.conflicts,
+        }
+
+    def _response(self, stored: StoredResponse, fingerprint: str, replayed: bool) -> Response:
+        if stored.fingerprint != fingerprint:
+            self.conflicts += 1
+            raise HTTPException(422, "Idempotency-Key was already used for a different request")
+
+        headers = None
+        if replayed:
+            self.replays += 1
+            headers = {"Idempotent-Replayed": "true"}
+        return Response(
+            content=stored.body,
+            status_code=stored.status_code,
+            media_type="application/json",
+            headers=headers,
+        )
+
+    async def execute(
+        self,
+        db: Database,
+        key: Optional[str],
+        scope: str,
+        fingerprint: str,
+        handler: Callable[[], Awaitable],
+        response_model: Type[BaseModel],
+    ):
+        if key is None:
+            return await handler()
+        if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise HTTPException(422, f"Idempotency-Key must be 1-{IDEMPOTENCY_KEY_MAX_LENGTH} characters")
+
+        # keys are only unique per client, so scope them to the caller
+        key = f"{scope}:{key}"
+
+        stored = self._peek(key)
+        if stored is not None:
+            self.hits += 1
+            return self._response(stored, fingerprint, replayed=True)
+        self.misses += 1
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.waited += 1
+            stored = await asyncio.shield(pending)
+            return self._response(stored, fingerprint, replayed=True)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            stored, replayed = await self._run(db, key, fingerprint, handler, response_model)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # duplicates re-raise it; mark retrieved so a lone caller does not warn
+            future.exception()
+            raise
+        else:
+            future.set_result(stored)
+        finally:
+            self._inflight.pop(key, None)
+
+        return self._response(stored, fingerprint, replayed)
+
+    async def _run(self, db, key, fingerprint, handler, response_model) -> Tuple[StoredResponse, bool]:
+        if time.monotonic() - self._last_prune > IDEMPOTENCY_PRUNE_INTERVAL:
+            self._last_prune = time.monotonic()
+            await db.run(_prune)
+
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+        while True:
+            claimed, row = await db.run(_claim, key, fingerprint)
+            if claimed:
+                break
+
+            stored = _stored(row)
+            if stored is not None:
+                self._put(key, stored)
+                return stored, True
+
+            # another instance holds the key: wait for its outcome
+            while row is not None and row.status == PENDING:
+                if time.monotonic() > deadline:
+                    raise HTTPException(409, "A request with this Idempotency-Key is still in progress")
+                await asyncio.sleep(IDEMPOTENCY_POLL_INTERVAL)
+                row = await db.run(_lookup, key)
+
+            stored = None if row is None else _stored(row)
+            if stored is not None:
+                self._put(key, stored)
+                return stored, True
+            # the other request failed and released the key; try to claim it
+
+        active = ActiveKey(key, fingerprint, response_model)
+        token = _active_key.set(active)
+        try:
+            result = await handler()
+        except BaseException:
+            # a key completed by the handler's own commit is kept (only pending rows go)
+            await db.run(_release, key)
+            raise
+        finally:
+            _active_key.reset(token)
+
+        stored = active.stored
+        if stored is None:
+            stored = StoredResponse(
+                fingerprint,
+                200,
+                response_model.model_validate(result).model_dump_json(),
+            )
+            await db.run(_complete, key, stored)
+        self._put(key, stored)
+        return stored, False
+
+
+idempotency = IdempotencyStore()
@@ -0,0 +1,142 @@
+import importlib.util
+import os
+import time
+from typing import List, Optional
+
+import httpx
+
+from metrics import observe_outbound
+
+# --------------------------
+# CONFIG
+# --------------------------
+
+INVENTORY_URL = os.getenv(
+    "INVENTORY_SERVICE_URL",
+    "http://inventory-service:8000",
+)
+
+INVENTORY_TIMEOUT = float(os.getenv("INVENTORY_TIMEOUT", "3"))
+INVENTORY_CONNECT_TIMEOUT = float(os.getenv("INVENTORY_CONNECT_TIMEOUT", "1"))
+INVENTORY_MAX_CONNECTIONS = int(os.getenv("INVENTORY_MAX_CONNECTIONS", "50"))
+INVENTORY_MAX_KEEPALIVE = int(os.getenv("INVENTORY_MAX_KEEPALIVE", "20"))
+INVENTORY_KEEPALIVE_EXPIRY = float(os.getenv("INVENTORY_KEEPALIVE_EXPIRY", "30"))
+
+# HTTP/2 needs the optional `h2` package (httpx[http2]); fall back to 1.1
+HTTP2_ENABLED = (
+    os.getenv("INVENTORY_HTTP2", "1") == "1"
+    and importlib.util.find_spec("h2") is not None
+)
+
+
+# --------------------------
+# CLIENT
+# --------------------------
+
+class InventoryClient:
+    """Application-scoped pooled client for inventory-service calls."""
+
+    def __init__(self, base_url: str = INVENTORY_URL):
+        self.base_url = base_url
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> None:
+        if self._client is not None:
+            return
+
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=HTTP2_ENABLED,
+            limits=httpx.Limits(
+                max_connections=INVENTORY_MAX_CONNECTIONS,
+                max_keepalive_connections=INVENTORY_MAX_KEEPALIVE,
+                keepalive_expiry=INVENTORY_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                INVENTORY_TIMEOUT,
+                connect=INVENTORY_CONNECT_TIMEOUT,
+            ),
+        )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError("InventoryClient is not started")
+        return self._client
+
+    async def _request(
+        self,
+        operation: str,
+        method: str,
+        url: str,
+        token: str,
+        timeout: Optional[float],
+        **kwargs,
+    ) -> httpx.Response:
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self.client.request(
+                method,
+                url,
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+                **kwargs,
+            )
+            outcome = str(response.status_code)
+            return response
+        finally:
+            observe_outbound("inventory", operation, outcome, started)
+
+    async def get_equipment(
+        self,
+        equipment_id: int,
+        token: str,
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        return await self._request(
+            "get_equipment", "GET", f"/equipment/{equipment_id}", token, timeout
+        )
+
+    async def get_equipment_batch(
+        self,
+        equipment_ids: List[int],
+        token: str,
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        return await self._request(
+            "get_equipment_batch",
+            "GET",
+            "/equipment/batch",
+            token,
+            timeout,
+            params={"ids": ",".join(map(str, equipment_ids))},
+        )
+
+    async def reserve_equipment(
+        self,
+        equipment_id: int,
+        token: str,
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        return await self._request(
+            "reserve_equipment", "POST", f"/equipment/{equipment_id}/reserve", token, timeout
+        )
+
+    async def release_equipment(
+        self,
+        equipment_id: int,
+        token: str,
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        return await self._request(
+            "release_equipment", "POST", f"/equipment/{equipment_id}/release", token, timeout
+        )
+
+
+inventory = InventoryClient()
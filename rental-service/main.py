@@ -1,19 +1,47 @@
-from datetime import datetime
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
 import math
 import os
-from typing import List
+from typing import Dict, List, Optional
 
-import requests
-from fastapi import FastAPI, Depends, HTTPException, status
+import httpx
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
 import jwt
 
+from admission import ADMISSION_ENABLED, AdmissionController, AdmissionMiddleware, AdmissionRule
+import analytics
 import models
 import schemas
-from database import Base, engine
-from deps import get_db
+from database import async_engine, engine, require_engine
+from deps import Database, get_db
+from auth_client import auth
+from fastjson import FAST_SERIALIZATION, FastJSONResponse, RowSerializer
+from gateway import enrich, equipment_loader, user_loader
+from idempotency import complete_in, idempotency
+from inventory_client import INVENTORY_MAX_CONNECTIONS, inventory
+from metrics import METRICS_ENABLED, MetricsMiddleware, instrument_engine, metrics_response, register_stats
+from migrations import MIGRATIONS
+from outbox import OutboxDispatcher, enqueue_equipment_release
+from pagination import PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT, filter_rentals, naive_utc, rental_page
+from penalties import PenaltySweeper, penalty_for
+from rate_cache import rate_cache
+from reservations import (
+    BOOKED,
+    CANCELLED,
+    RESERVATION_HORIZON_DAYS,
+    RESERVATION_MAX_MINUTES,
+    RESERVATION_MIN_MINUTES,
+    RESERVATION_WALK_IN_MINUTES,
+    ReservationConverter,
+    load_open_rental_rows,
+    load_reservation_rows,
+    reservation_index,
+)
+from schema import migrate
+from startup import FirstRequestMiddleware, StartupReport
+from token_cache import token_cache
 
 # --------------------------
 # CONFIG
@@ -21,14 +49,12 @@ from deps import get_db
 
 SECRET_KEY = os.getenv("SECRET_KEY", "SUPER_SECRET_KEY_CHANGE_ME")
 ALGORITHM = "HS256"
-
-INVENTORY_URL = os.getenv(
-    "INVENTORY_SERVICE_URL",
-    "http://inventory-service:8000",
-)
+SERVICE_TOKEN_EXPIRE_MINUTES = 5
 
 bearer = HTTPBearer()
 
+rental_rows = RowSerializer(models.Rental, schemas.Rental)
+
 # --------------------------
 # AUTH
 # --------------------------
@@ -44,6 +70,10 @@ def get_current_user(
 ) -> TokenUser:
     token = credentials.credentials
 
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except jwt.ExpiredSignatureError:
@@ -57,10 +87,12 @@ def get_current_user(
             "Invalid token",
         )
 
-    return TokenUser(
+    user = TokenUser(
         user_id=int(payload["sub"]),
         role=payload["role"],
     )
+    token_cache.put(token, user, payload.get("exp"))
+    return user
 
 
 def get_admin_user(
@@ -78,13 +110,77 @@ def get_admin_user(
 # APP INIT
 # --------------------------
 
+def service_token() -> str:
+    # inventory state changes (reserve, outbox releases) are not the user's to make,
+    # so they go out under a short-lived service identity
+    expire = datetime.utcnow() + timedelta(minutes=SERVICE_TOKEN_EXPIRE_MINUTES)
+    payload = {
+        "sub": "0",
+        "role": "admin",
+        "exp": expire,
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+
+outbox_dispatcher = OutboxDispatcher(inventory, service_token)
+penalty_sweeper = PenaltySweeper()
+reservation_converter = ReservationConverter(inventory, service_token, reservation_index)
+startup_report = StartupReport("rental-service")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db_engine = require_engine()
+    with startup_report.phase("schema"):
+        startup_report.schema_from, startup_report.schema_to = migrate(db_engine, MIGRATIONS)
+
+    with startup_report.phase("reservation_index"):
+        reservation_index.load(load_reservation_rows(), load_open_rental_rows())
+
+    await inventory.start()
+    await auth.start()
+    await outbox_dispatcher.start()
+    await penalty_sweeper.start()
+    await reservation_converter.start()
+    startup_report.ready()
+    try:
+        yield
+    finally:
+        await reservation_converter.stop()
+        await penalty_sweeper.stop()
+        await outbox_dispatcher.stop()
+        await auth.close()
+        await inventory.close()
+
+
 app = FastAPI(
     title="Bike4You RentalService",
     version="1.0.0",
     swagger_ui_parameters={"persistAuthorization": True},
+    lifespan=lifespan,
 )
 
-Base.metadata.create_all(bind=engine)
+# --------------------------
+# ADMISSION CONTROL
+# --------------------------
+# added before CORS so shed responses still carry CORS headers
+
+# routes that wait on other services; admitting more than the inventory
+# pool has connections only moves the queue into httpx
+admission = AdmissionController([
+    AdmissionRule(
+        "upstream",
+        [
+            ("POST", "/rentals/start"),
+            ("POST", "/rentals/return/"),
+            ("GET", "/rentals/all/enriched"),
+        ],
+        concurrency=INVENTORY_MAX_CONNECTIONS,
+    ),
+])
+
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, controller=admission)
 
 # --------------------------
 # CORS
@@ -108,19 +204,56 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Idempotent-Replayed"],
 )
 
+# --------------------------
+# METRICS
+# --------------------------
+
+def outbox_counters() -> dict:
+    return {
+        "dispatched": outbox_dispatcher.dispatched,
+        "failed": outbox_dispatcher.failed,
+        "last_dispatch_lag_seconds": outbox_dispatcher.last_dispatch_lag,
+    }
+
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    if engine is not None:
+        instrument_engine(engine)
+    if async_engine is not None:
+        instrument_engine(async_engine.sync_engine)
+    register_stats("token_cache", token_cache.stats)
+    register_stats("rate_cache", rate_cache.stats)
+    register_stats("outbox", outbox_counters)
+    register_stats("startup", startup_report.stats)
+    register_stats("admission", admission.stats)
+    register_stats("idempotency", idempotency.stats)
+    register_stats("penalty_sweeper", penalty_sweeper.stats)
+    register_stats("reservation_index", reservation_index.stats)
+    register_stats("reservation_converter", reservation_converter.stats)
+    register_stats("enrich_equipment", equipment_loader.stats)
+    register_stats("enrich_users", user_loader.stats)
+
+app.add_middleware(FirstRequestMiddleware, report=startup_report)
+
 # --------------------------
 # HELPERS
 # --------------------------
 
-def get_rate(equipment_id: int, token: str) -> float:
-    resp = requests.get(
-        f"{INVENTORY_URL}/equipment/{equipment_id}",
-        headers={"Authorization": f"Bearer {token}"},
-        timeout=3,
-    )
+async def fetch_rate(equipment_id: int, token: str) -> float:
+    try:
+        resp = await inventory.get_equipment(equipment_id, token)
+    except httpx.HTTPError:
+        raise HTTPException(
+            status.HTTP_502_BAD_GATEWAY,
+            "Inventory service unavailable",
+        )
 
+    if resp.status_code == 404:
+        raise HTTPException(404, "Equipment not found")
     if resp.status_code != 200:
         raise HTTPException(
             status.HTTP_502_BAD_GATEWAY,
@@ -130,6 +263,85 @@ def get_rate(equipment_id: int, token: str) -> float:
     return float(resp.json()["hourly_rate"])
 
 
+async def get_rate(equipment_id: int, token: str) -> float:
+    return await rate_cache.get(
+        equipment_id,
+        lambda eid: fetch_rate(eid, token),
+    )
+
+
+async def get_rates(equipment_ids: List[int], token: str) -> Dict[int, float]:
+    """Rates for many equipment ids: cache first, then one batch call for the rest."""
+    rates = {}
+    missing = []
+    for equipment_id in dict.fromkeys(equipment_ids):
+        rate = rate_cache.peek(equipment_id)
+        if rate is None:
+            missing.append(equipment_id)
+        else:
+            rates[equipment_id] = rate
+
+    if not missing:
+        return rates
+
+    try:
+        resp = await inventory.get_equipment_batch(missing, token)
+    except httpx.HTTPError:
+        resp = None
+
+    if resp is None or resp.status_code != 200:
+        raise HTTPException(
+            status.HTTP_502_BAD_GATEWAY,
+            "Inventory service unavailable",
+        )
+
+    for item in resp.json()["items"]:
+        rates[item["id"]] = float(item["hourly_rate"])
+        rate_cache.put(item["id"], rates[item["id"]])
+    return rates
+
+
+async def reserve_equipment(equipment_id: int, token: str) -> dict:
+    """Atomically mark the equipment rented in inventory; returns the reservation."""
+    try:
+        resp = await inventory.reserve_equipment(equipment_id, token)
+    except httpx.HTTPError:
+        raise HTTPException(
+            status.HTTP_502_BAD_GATEWAY,
+            "Inventory service unavailable",
+        )
+
+    if resp.status_code == 404:
+        raise HTTPException(404, "Equipment not found")
+    if resp.status_code == 409:
+        raise HTTPException(status.HTTP_409_CONFLICT, "Equipment is not available")
+    if resp.status_code != 200:
+        raise HTTPException(
+            status.HTTP_502_BAD_GATEWAY,
+            "Inventory service unavailable",
+        )
+
+    reservation = resp.json()
+    rate_cache.put(equipment_id, float(reservation["hourly_rate"]))
+    return reservation
+
+
+def rental_query(s):
+    # the fast path selects plain columns; the default path loads ORM entities
+    if FAST_SERIALIZATION:
+        return s.query(*rental_rows.columns)
+    return s.query(models.Rental)
+
+
+def rental_list_response(page: dict):
+    if not FAST_SERIALIZATION:
+        return page
+    # returning a Response bypasses response_model validation, rows are already in shape
+    return FastJSONResponse(
+        {"items": rental_rows(page["items"]), "next_cursor": page["next_cursor"]}
+    )
+
+
 def calc_price(start: datetime, end: datetime, rate: float):
     minutes = max(1, math.ceil((end - start).total_seconds() / 60))
     hours = max(1, math.ceil(minutes / 60))
@@ -141,50 +353,94 @@ def calc_price(start: datetime, end: datetime, rate: float):
 # --------------------------
 
 @app.post("/rentals/start", response_model=schemas.Rental)
-def start_rental(
+async def start_rental(
     data: schemas.RentalCreate,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     current: TokenUser = Depends(get_current_user),
-    creds: HTTPAuthorizationCredentials = Depends(bearer),
+    idempotency_key: Optional[str] = Header(default=None),
 ):
-    token = creds.credentials
+    # a retried request replays the first response instead of reserving again
+    return await idempotency.execute(
+        db,
+        idempotency_key,
+        str(current.user_id),
+        f"POST /rentals/start {data.equipment_id}",
+        lambda: begin_rental(data, db, current),
+        schemas.Rental,
+    )
+
+
+async def begin_rental(data: schemas.RentalCreate, db: Database, current: TokenUser):
+    now = datetime.utcnow()
+    walk_in_end = now + timedelta(minutes=RESERVATION_WALK_IN_MINUTES)
+    if reservation_index.conflict(data.equipment_id, now, walk_in_end) is not None:
+        raise HTTPException(status.HTTP_409_CONFLICT, "Equipment is reserved for an upcoming booking")
+
+    # claimed before the first await, so no booking can take the slot while inventory answers
+    claimed = reservation_index.open_rental(data.equipment_id, now)
+    try:
+        reservation = await reserve_equipment(data.equipment_id, service_token())
+    except Exception:
+        if claimed:
+            reservation_index.close_rental(data.equipment_id)
+        raise
 
     rental = models.Rental(
         user_id=current.user_id,
         equipment_id=data.equipment_id,
-        start_time=datetime.utcnow(),
+        start_time=now,
         status="active",
+        hourly_rate=float(reservation["hourly_rate"]),
+        equipment_type=reservation.get("type"),
     )
 
-    db.add(rental)
-    db.commit()
-    db.refresh(rental)
+    def record(s):
+        s.add(rental)
+        s.flush()
+        complete_in(s, rental)
+        s.commit()
 
     try:
-        requests.post(
-            f"{INVENTORY_URL}/equipment/update",
-            json={"id": data.equipment_id, "status": "rented"},
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=3,
-        )
+        await db.run(record)
     except Exception:
-        pass
+        if claimed:
+            reservation_index.close_rental(data.equipment_id)
+        # the bike is reserved in inventory but no rental exists: hand it back
+        try:
+            await inventory.release_equipment(data.equipment_id, service_token())
+        except httpx.HTTPError:
+            pass
+        raise
+
+    await db.refresh(rental)
 
     return rental
 
 
 @app.post("/rentals/return/{rental_id}", response_model=schemas.Rental)
-def return_rental(
+async def return_rental(
     rental_id: int,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
     current: TokenUser = Depends(get_current_user),
     creds: HTTPAuthorizationCredentials = Depends(bearer),
+    idempotency_key: Optional[str] = Header(default=None),
 ):
-    token = creds.credentials
+    return await idempotency.execute(
+        db,
+        idempotency_key,
+        str(current.user_id),
+        f"POST /rentals/return/{rental_id}",
+        lambda: complete_rental(rental_id, db, current, creds.credentials),
+        schemas.Rental,
+    )
 
-    rental = db.query(models.Rental).filter(
-        models.Rental.id == rental_id
-    ).first()
+
+async def complete_rental(rental_id: int, db: Database, current: TokenUser, token: str):
+    rental = await db.run(
+        lambda s: s.query(models.Rental).filter(
+            models.Rental.id == rental_id
+        ).first()
+    )
 
     if not rental:
         raise HTTPException(404, "Rental not found")
@@ -196,50 +452,364 @@ def return_rental(
         raise HTTPException(400, "Rental already completed")
 
     end_time = datetime.utcnow()
-    rate = get_rate(rental.equipment_id, token)
+    rate = rental.hourly_rate
+    if rate is None:
+        # rentals started before rates were locked in at reservation time
+        rate = await get_rate(rental.equipment_id, token)
     minutes, total_price = calc_price(rental.start_time, end_time, rate)
+    penalty = penalty_for(rental.start_time, end_time)
+
+    def complete(s):
+        # conditional so a concurrent return cannot complete (and count) it twice
+        updated = s.query(models.Rental).filter(
+            models.Rental.id == rental.id,
+            models.Rental.status == "active",
+        ).update(
+            {
+                "end_time": end_time,
+                "total_minutes": minutes,
+                "total_price": total_price,
+                "penalty_eur": penalty,
+                "status": "completed",
+            },
+            synchronize_session=False,
+        )
+        if not updated:
+            s.rollback()
+            raise HTTPException(400, "Rental already completed")
+
+        enqueue_equipment_release(s, rental.equipment_id)
+        analytics.record_rental(
+            s,
+            rental.equipment_id,
+            rental.equipment_type,
+            rental.start_time,
+            minutes,
+            total_price + penalty,
+        )
+        # the bulk update above bypassed the loaded rental; reload it for the stored response
+        s.refresh(rental)
+        complete_in(s, rental)
+        s.commit()
 
-    rental.end_time = end_time
-    rental.total_minutes = minutes
-    rental.total_price = total_price
-    rental.status = "completed"
+    await db.run(complete)
+    await db.refresh(rental)
+    reservation_index.close_rental(rental.equipment_id)
 
-    db.commit()
-    db.refresh(rental)
+    outbox_dispatcher.wake()
 
-    try:
-        requests.post(
-            f"{INVENTORY_URL}/equipment/update",
-            json={"id": rental.equipment_id, "status": "available"},
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=3,
+    return rental
+
+
+@app.get("/rentals/my", response_model=schemas.RentalList)
+async def my_rentals(
+    status: Optional[str] = Query(default=None),
+    start_from: Optional[datetime] = Query(default=None),
+    start_to: Optional[datetime] = Query(default=None),
+    cursor: Optional[str] = Query(default=None),
+    limit: int = Query(default=PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    db: Database = Depends(get_db),
+    current: TokenUser = Depends(get_current_user),
+):
+    def page(s):
+        query = rental_query(s).filter(
+            models.Rental.user_id == current.user_id
         )
-    except Exception:
-        pass
+        query = filter_rentals(query, status, start_from, start_to)
+        return rental_page(query, cursor, limit)
 
-    return rental
+    return rental_list_response(await db.run(page))
 
 
-@app.get("/rentals/my", response_model=List[schemas.Rental])
-def my_rentals(
-    db: Session = Depends(get_db),
+@app.get("/rentals/active", response_model=schemas.ActiveRentalList)
+async def active_rentals(
+    db: Database = Depends(get_db),
     current: TokenUser = Depends(get_current_user),
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
 ):
-    return (
-        db.query(models.Rental)
-        .filter(models.Rental.user_id == current.user_id)
-        .order_by(models.Rental.start_time.desc())
-        .all()
+    rentals = await db.run(
+        lambda s: s.query(models.Rental).filter(
+            models.Rental.user_id == current.user_id,
+            models.Rental.status == "active",
+        ).order_by(models.Rental.start_time.desc()).all()
     )
 
+    # rates are locked in at reservation; only legacy rentals need a lookup
+    unpriced = [r.equipment_id for r in rentals if r.hourly_rate is None]
+    rates = await get_rates(unpriced, creds.credentials) if unpriced else {}
+
+    now = datetime.utcnow()
+    items = []
+    for rental in rentals:
+        rate = rental.hourly_rate
+        if rate is None:
+            # None when the equipment is no longer in inventory
+            rate = rates.get(rental.equipment_id)
+
+        minutes, price = calc_price(rental.start_time, now, rate or 0.0)
+        if rate is None:
+            price = None
+        items.append(
+            schemas.ActiveRental(
+                **schemas.Rental.model_validate(rental).model_dump(),
+                current_minutes=minutes,
+                current_price=price,
+                projected_penalty_eur=penalty_for(rental.start_time, now),
+            )
+        )
+
+    return {
+        "as_of": now,
+        "items": items,
+        "total_eur": sum((i.current_price or 0.0) + i.projected_penalty_eur for i in items),
+    }
+
+
+@app.get("/rentals/all", response_model=schemas.RentalList)
+async def all_rentals(
+    status: Optional[str] = Query(default=None),
+    start_from: Optional[datetime] = Query(default=None),
+    start_to: Optional[datetime] = Query(default=None),
+    cursor: Optional[str] = Query(default=None),
+    limit: int = Query(default=PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    db: Database = Depends(get_db),
+    admin: TokenUser = Depends(get_admin_user),
+):
+    def page(s):
+        query = filter_rentals(rental_query(s), status, start_from, start_to)
+        return rental_page(query, cursor, limit)
+
+    return rental_list_response(await db.run(page))
+
 
-@app.get("/rentals/all", response_model=List[schemas.Rental])
-def all_rentals(
-    db: Session = Depends(get_db),
+@app.get("/rentals/all/enriched", response_model=schemas.EnrichedRentalList)
+async def all_rentals_enriched(
+    status: Optional[str] = Query(default=None),
+    start_from: Optional[datetime] = Query(default=None),
+    start_to: Optional[datetime] = Query(default=None),
+    cursor: Optional[str] = Query(default=None),
+    limit: int = Query(default=PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    db: Database = Depends(get_db),
     admin: TokenUser = Depends(get_admin_user),
+    credentials: HTTPAuthorizationCredentials = Depends(bearer),
 ):
-    return (
-        db.query(models.Rental)
-        .order_by(models.Rental.start_time.desc())
-        .all()
+    def page(s):
+        query = filter_rentals(rental_query(s), status, start_from, start_to)
+        return rental_page(query, cursor, limit)
+
+    result = await db.run(page)
+    if FAST_SERIALIZATION:
+        items = rental_rows(result["items"])
+    else:
+        items = [schemas.Rental.model_validate(r).model_dump() for r in result["items"]]
+
+    # one batched call per upstream for the whole page, not one per rental
+    items = await enrich(items, credentials.credentials)
+    if FAST_SERIALIZATION:
+        return FastJSONResponse({"items": items, "next_cursor": result["next_cursor"]})
+    return {"items": items, "next_cursor": result["next_cursor"]}
+
+
+@app.post("/rentals/reservations", response_model=schemas.Reservation)
+async def create_reservation(
+    data: schemas.ReservationCreate,
+    db: Database = Depends(get_db),
+    current: TokenUser = Depends(get_current_user),
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
+):
+    start, end = naive_utc(data.start_time), naive_utc(data.end_time)
+    now = datetime.utcnow()
+    if start <= now:
+        raise HTTPException(422, "Reservations must start in the future; use /rentals/start")
+    if start > now + timedelta(days=RESERVATION_HORIZON_DAYS):
+        raise HTTPException(422, f"Reservations open at most {RESERVATION_HORIZON_DAYS} days ahead")
+    minutes = (end - start).total_seconds() / 60
+    if not RESERVATION_MIN_MINUTES <= minutes <= RESERVATION_MAX_MINUTES:
+        raise HTTPException(
+            422,
+            f"Reservations last {RESERVATION_MIN_MINUTES}-{RESERVATION_MAX_MINUTES} minutes",
+        )
+
+    # 404 for unknown equipment; usually served from the rate cache
+    await get_rate(data.equipment_id, creds.credentials)
+
+    # check and claim the slot with no await in between, so no other request can take it
+    conflict = reservation_index.conflict(data.equipment_id, start, end)
+    if conflict is not None:
+        raise HTTPException(status.HTTP_409_CONFLICT, "Equipment is already reserved for that time")
+    if reservation_index.rented(data.equipment_id, start, end):
+        raise HTTPException(status.HTTP_409_CONFLICT, "Equipment is rented out for that time")
+
+    reservation = models.Reservation(
+        user_id=current.user_id,
+        equipment_id=data.equipment_id,
+        start_time=start,
+        end_time=end,
+        status=BOOKED,
     )
+    db.add(reservation)
+    # a placeholder id holds the slot until the row has its real one
+    placeholder = -id(reservation)
+    reservation_index.add(data.equipment_id, placeholder, start, end)
+    try:
+        await db.commit()
+        await db.refresh(reservation)
+    finally:
+        reservation_index.remove(data.equipment_id, placeholder, start)
+    reservation_index.add(data.equipment_id, reservation.id, start, end)
+
+    return reservation
+
+
+@app.get("/rentals/reservations/my", response_model=List[schemas.Reservation])
+async def my_reservations(
+    status: Optional[str] = Query(default=None),
+    db: Database = Depends(get_db),
+    current: TokenUser = Depends(get_current_user),
+):
+    def fetch(s):
+        query = s.query(models.Reservation).filter(
+            models.Reservation.user_id == current.user_id
+        )
+        if status is not None:
+            query = query.filter(models.Reservation.status == status)
+        return query.order_by(models.Reservation.start_time).all()
+
+    return await db.run(fetch)
+
+
+@app.get("/rentals/reservations/free", response_model=schemas.FreeSlots)
+async def free_slots(
+    equipment_id: int = Query(...),
+    start: datetime = Query(...),
+    end: datetime = Query(...),
+    min_minutes: int = Query(default=RESERVATION_MIN_MINUTES, ge=1),
+    current: TokenUser = Depends(get_current_user),
+):
+    start, end = naive_utc(start), naive_utc(end)
+    if end <= start:
+        raise HTTPException(422, "end must be after start")
+    if end - start > timedelta(days=RESERVATION_HORIZON_DAYS):
+        raise HTTPException(422, f"Window is at most {RESERVATION_HORIZON_DAYS} days")
+
+    # async on purpose: the index is only read and written on the event loop
+    slots = reservation_index.free(equipment_id, start, end, timedelta(minutes=min_minutes))
+    return {
+        "equipment_id": equipment_id,
+        "slots": [{"start_time": a, "end_time": b} for a, b in slots],
+    }
+
+
+@app.post("/rentals/reservations/{reservation_id}/cancel", response_model=schemas.Reservation)
+async def cancel_reservation(
+    reservation_id: int,
+    db: Database = Depends(get_db),
+    current: TokenUser = Depends(get_current_user),
+):
+    reservation = await db.run(
+        lambda s: s.query(models.Reservation).filter(
+            models.Reservation.id == reservation_id
+        ).first()
+    )
+
+    if not reservation:
+        raise HTTPException(404, "Reservation not found")
+
+    if reservation.user_id != current.user_id and current.role != "admin":
+        raise HTTPException(403, "Forbidden")
+
+    def cancel(s):
+        # conditional so it cannot race the converter turning it into a rental
+        updated = s.query(models.Reservation).filter(
+            models.Reservation.id == reservation_id,
+            models.Reservation.status == BOOKED,
+        ).update({"status": CANCELLED}, synchronize_session=False)
+        if not updated:
+            s.rollback()
+            raise HTTPException(400, "Only booked reservations can be cancelled")
+        s.commit()
+
+    await db.run(cancel)
+    await db.refresh(reservation)
+    reservation_index.remove(reservation.equipment_id, reservation.id, reservation.start_time)
+
+    return reservation
+
+
+@app.post("/rentals/rates/invalidate", status_code=status.HTTP_204_NO_CONTENT)
+def invalidate_rate(
+    data: schemas.RateInvalidation,
+    admin: TokenUser = Depends(get_admin_user),
+):
+    rate_cache.invalidate(data.equipment_id)
+
+    if data.equipment_id is not None and data.hourly_rate is not None:
+        rate_cache.put(data.equipment_id, data.hourly_rate)
+
+
+@app.get("/rentals/outbox/stats", response_model=schemas.OutboxStats)
+async def outbox_stats(
+    db: Database = Depends(get_db),
+    admin: TokenUser = Depends(get_admin_user),
+):
+    return await db.run(outbox_dispatcher.stats)
+
+
+# --------------------------
+# ANALYTICS
+# --------------------------
+
+@app.get("/rentals/analytics/revenue", response_model=List[schemas.RevenueRow])
+async def revenue_analytics(
+    group_by: str = Query(default="day", pattern="^(day|equipment|type)$"),
+    date_from: Optional[date] = Query(default=None),
+    date_to: Optional[date] = Query(default=None),
+    db: Database = Depends(get_db),
+    admin: TokenUser = Depends(get_admin_user),
+):
+    date_from, date_to = analytics.period(date_from, date_to)
+    return await db.run(analytics.revenue, group_by, date_from, date_to)
+
+
+@app.get("/rentals/analytics/utilization", response_model=schemas.Utilization)
+async def utilization_analytics(
+    date_from: Optional[date] = Query(default=None),
+    date_to: Optional[date] = Query(default=None),
+    fleet_size: Optional[int] = Query(default=None, ge=1),
+    db: Database = Depends(get_db),
+    admin: TokenUser = Depends(get_admin_user),
+):
+    date_from, date_to = analytics.period(date_from, date_to)
+    return await db.run(analytics.utilization, date_from, date_to, fleet_size)
+
+
+@app.get("/rentals/analytics/peak-hours", response_model=List[schemas.PeakHour])
+async def peak_hours_analytics(
+    date_from: Optional[date] = Query(default=None),
+    date_to: Optional[date] = Query(default=None),
+    db: Database = Depends(get_db),
+    admin: TokenUser = Depends(get_admin_user),
+):
+    date_from, date_to = analytics.period(date_from, date_to)
+    return await db.run(analytics.peak_hours, date_from, date_to)
+
+
+@app.post("/rentals/analytics/rebuild", response_model=schemas.RollupRebuild)
+async def rebuild_analytics(
+    db: Database = Depends(get_db),
+    admin: TokenUser = Depends(get_admin_user),
+):
+    return {"rows": await db.run(analytics.rebuild)}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return metrics_response()
+
+
+@app.get("/health/startup", include_in_schema=False)
+def startup_health():
+    return startup_report.as_dict()
+
+
+startup_report.mark("imported")
@@ -0,0 +1,44 @@
+from sqlalchemy.orm import Session
+
+import analytics
+import models
+from database import Base
+from schema import Migration, add_column, create_indexes
+
+
+def create_tables(conn) -> None:
+    # creates whatever is missing from the current models; existing tables are left alone
+    Base.metadata.create_all(bind=conn)
+
+
+def rental_reservation_columns(conn) -> None:
+    add_column(conn, "rentals", "hourly_rate", "FLOAT")
+    add_column(conn, "rentals", "equipment_type", "VARCHAR")
+
+
+def rental_indexes(conn) -> None:
+    create_indexes(conn, models.Rental.__table__)
+
+
+def idempotency_keys(conn) -> None:
+    models.IdempotencyKey.__table__.create(bind=conn, checkfirst=True)
+
+
+def reservations(conn) -> None:
+    models.Reservation.__table__.create(bind=conn, checkfirst=True)
+
+
+def rollup_penalties(conn) -> None:
+    # rollups written before penalties counted as revenue; recompute them from history
+    analytics.rebuild(Session(bind=conn))
+
+
+MIGRATIONS = [
+    Migration(1, "create tables", create_tables),
+    Migration(2, "rentals.hourly_rate, rentals.equipment_type", rental_reservation_columns),
+    Migration(3, "rentals indexes", rental_indexes),
+    Migration(4, "idempotency_keys", idempotency_keys),
+    Migration(5, "rentals status/start_time index", rental_indexes),
+    Migration(6, "reservations", reservations),
+    Migration(7, "rollup revenue includes penalties", rollup_penalties),
+]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float
+from sqlalchemy import Column, Integer, String, Date, DateTime, Float, Index, Text
 from datetime import datetime
 from database import Base
 
@@ -9,9 +9,78 @@ class Rental(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False)
     equipment_id = Column(Integer, nullable=False)
-    start_time = Column(DateTime, default=datetime.utcnow)
+    start_time = Column(DateTime, default=datetime.utcnow, index=True)
     end_time = Column(DateTime, nullable=True)
     status = Column(String, default="active")  # active / completed / cancelled и т.п.
     total_minutes = Column(Integer, nullable=True)
     total_price = Column(Float, nullable=True)  # общая стоимость аренды в евро
     penalty_eur = Column(Float, default=0.0)    # на будущее, штрафы и т.п.
+    hourly_rate = Column(Float, nullable=True)  # rate locked in by the inventory reservation
+    equipment_type = Column(String, nullable=True)  # bike / scooter / ski, from the reservation
+
+    __table_args__ = (
+        # per-user history ordered by start_time
+        Index("ix_rentals_user_id_start_time", "user_id", "start_time"),
+        # overdue sweep: active rentals by age
+        Index("ix_rentals_status_start_time", "status", "start_time"),
+    )
+
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String, nullable=False, index=True)     # equipment:<id>, newer events supersede older ones
+    topic = Column(String, nullable=False)               # equipment.release
+    payload = Column(Text, nullable=False)               # JSON body for inventory-service
+    status = Column(String, default="pending", index=True)  # pending / dead
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_error = Column(String, nullable=True)
+
+
+class RentalRollup(Base):
+    # completed rentals pre-aggregated per start day, start hour and equipment
+    __tablename__ = "rental_rollups"
+
+    day = Column(Date, primary_key=True)
+    hour = Column(Integer, primary_key=True)  # 0-23, hour the rental started
+    equipment_id = Column(Integer, primary_key=True)
+    equipment_type = Column(String, nullable=True)
+    rentals = Column(Integer, nullable=False, default=0)
+    minutes = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+
+class IdempotencyKey(Base):
+    # stored outcome of a start/return call, replayed when a client retries it
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)             # <user_id>:<Idempotency-Key header>
+    fingerprint = Column(String, nullable=False)       # method, path and body the key was first used with
+    status = Column(String, nullable=False, default="pending")  # pending / completed
+    status_code = Column(Integer, nullable=True)
+    response = Column(Text, nullable=True)              # JSON body of the first response
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class Reservation(Base):
+    # a future slot [start_time, end_time) on one equipment; becomes a Rental when it starts
+    __tablename__ = "reservations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    equipment_id = Column(Integer, nullable=False)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    status = Column(String, nullable=False, default="booked")  # booked / converted / cancelled / expired / failed
+    rental_id = Column(Integer, nullable=True)  # set once converted
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # converter: booked reservations by start time
+        Index("ix_reservations_status_start_time", "status", "start_time"),
+        # startup load of each equipment's schedule
+        Index("ix_reservations_equipment_id_start_time", "equipment_id", "start_time"),
+    )
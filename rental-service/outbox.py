@@ -0,0 +1,227 @@
+import asyncio
+import json
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+import httpx
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+from inventory_client import InventoryClient
+
+# --------------------------
+# CONFIG
+# --------------------------
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "1"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "300"))
+
+EQUIPMENT_RELEASE = "equipment.release"
+
+
+# --------------------------
+# WRITE SIDE
+# --------------------------
+
+def enqueue_equipment_release(db: Session, equipment_id: int) -> None:
+    # added to the caller's session so it commits together with the rental row
+    db.add(
+        models.OutboxEvent(
+            key=f"equipment:{equipment_id}",
+            topic=EQUIPMENT_RELEASE,
+            payload=json.dumps({"id": equipment_id}),
+        )
+    )
+
+
+def backoff_delay(attempts: int) -> float:
+    delay = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+# --------------------------
+# DISPATCHER
+# --------------------------
+
+class OutboxDispatcher:
+    """Drains pending outbox events to inventory-service in the background.
+
+    Status updates are last-write-wins, so when an equipment has several
+    pending events only the newest is sent and the older ones are dropped.
+    Delivery is at-least-once.
+    """
+
+    def __init__(
+        self,
+        client: InventoryClient,
+        token_provider: Callable[[], str],
+        session_factory=SessionLocal,
+    ):
+        self.client = client
+        self.token_provider = token_provider
+        self.session_factory = session_factory
+        self.last_dispatch_lag: Optional[float] = None
+        self.dispatched = 0
+        self.failed = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def wake(self) -> None:
+        # called from async handlers on the event loop, after their commit
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                sent = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # DB hiccup; keep the loop alive and try again after the poll interval
+                sent = 0
+
+            if sent >= OUTBOX_BATCH_SIZE:
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def drain_once(self) -> int:
+        events = await asyncio.to_thread(self._claim_batch)
+        if not events:
+            return 0
+
+        token = self.token_provider()
+        results = await asyncio.gather(
+            *(self._send(event, token) for event in events)
+        )
+        await asyncio.to_thread(self._record_results, events, results)
+        return len(events)
+
+    def _claim_batch(self) -> List[models.OutboxEvent]:
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(models.OutboxEvent)
+                .filter(models.OutboxEvent.status == "pending")
+                .filter(models.OutboxEvent.next_attempt_at <= datetime.utcnow())
+                .order_by(models.OutboxEvent.id)
+                .limit(OUTBOX_BATCH_SIZE)
+                .all()
+            )
+            db.expunge_all()
+        finally:
+            db.close()
+
+        newest = {}
+        for row in rows:
+            newest[row.key] = row
+        return list(newest.values())
+
+    async def _send(self, event: models.OutboxEvent, token: str) -> Optional[str]:
+        if event.topic != EQUIPMENT_RELEASE:
+            return f"dead: unknown topic {event.topic}"
+
+        payload = json.loads(event.payload)
+        try:
+            resp = await self.client.release_equipment(payload["id"], token)
+        except httpx.HTTPError as exc:
+            return f"retry: {exc.__class__.__name__}"
+
+        if resp.status_code == 200:
+            return None
+        if resp.status_code == 409:
+            # already released (e.g. by an admin); nothing left to deliver
+            return None
+        if resp.status_code == 429 or resp.status_code >= 500:
+            return f"retry: HTTP {resp.status_code}"
+        return f"dead: HTTP {resp.status_code}"
+
+    def _record_results(
+        self,
+        events: List[models.OutboxEvent],
+        results: List[Optional[str]],
+    ) -> None:
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            for event, error in zip(events, results):
+                # older events for the key are superseded whatever the outcome,
+                # so a retry can never re-send a stale status after a newer one
+                db.query(models.OutboxEvent).filter(
+                    models.OutboxEvent.key == event.key,
+                    models.OutboxEvent.id < event.id,
+                ).delete(synchronize_session=False)
+
+                if error is None:
+                    db.query(models.OutboxEvent).filter(
+                        models.OutboxEvent.id == event.id,
+                    ).delete(synchronize_session=False)
+                    self.dispatched += 1
+                    self.last_dispatch_lag = (now - event.created_at).total_seconds()
+                    continue
+
+                self.failed += 1
+                attempts = event.attempts + 1
+                dead = error.startswith("dead") or attempts >= OUTBOX_MAX_ATTEMPTS
+
+                db.query(models.OutboxEvent).filter(
+                    models.OutboxEvent.id == event.id,
+                ).update(
+                    {
+                        "attempts": attempts,
+                        "last_error": error,
+                        "status": "dead" if dead else "pending",
+                        "next_attempt_at": now + timedelta(seconds=backoff_delay(attempts)),
+                    },
+                    synchronize_session=False,
+                )
+            db.commit()
+        finally:
+            db.close()
+
+    def stats(self, db: Session) -> dict:
+        pending = db.query(
+            func.count(models.OutboxEvent.id),
+            func.min(models.OutboxEvent.created_at),
+        ).filter(models.OutboxEvent.status == "pending").one()
+        dead = db.query(func.count(models.OutboxEvent.id)).filter(
+            models.OutboxEvent.status == "dead"
+        ).scalar()
+
+        depth, oldest = pending
+        return {
+            "depth": depth,
+            "dead": dead,
+            "oldest_pending_age_seconds": (
+                (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+            ),
+            "last_dispatch_lag_seconds": self.last_dispatch_lag,
+            "dispatched_total": self.dispatched,
+            "failed_total": self.failed,
+        }
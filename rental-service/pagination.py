@@ -0,0 +1,90 @@
+import base64
+import os
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+import models
+
+# --------------------------
+# CONFIG
+# --------------------------
+
+PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", "50"))
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "200"))
+
+
+def naive_utc(value: datetime) -> datetime:
+    # stored times are naive UTC; accept offset-aware input too
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# --------------------------
+# CURSOR
+# --------------------------
+
+def encode_cursor(start_time: datetime, rental_id: int) -> str:
+    raw = f"{start_time.isoformat()}|{rental_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        start_time, rental_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(start_time), int(rental_id)
+    except ValueError:
+        raise HTTPException(422, "Invalid cursor")
+
+
+# --------------------------
+# QUERY
+# --------------------------
+
+def filter_rentals(
+    query: Query,
+    status: Optional[str] = None,
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+) -> Query:
+    if status is not None:
+        query = query.filter(models.Rental.status == status)
+    if start_from is not None:
+        query = query.filter(models.Rental.start_time >= naive_utc(start_from))
+    if start_to is not None:
+        query = query.filter(models.Rental.start_time < naive_utc(start_to))
+    return query
+
+
+def rental_page(query: Query, cursor: Optional[str], limit: int) -> dict:
+    """Newest-first keyset page over (start_time, id)."""
+    if cursor is not None:
+        start_time, rental_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                models.Rental.start_time < start_time,
+                and_(
+                    models.Rental.start_time == start_time,
+                    models.Rental.id < rental_id,
+                ),
+            )
+        )
+
+    # fetch one extra row to know whether another page exists
+    rows = (
+        query.order_by(models.Rental.start_time.desc(), models.Rental.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].start_time, rows[-1].id)
+
+    return {"items": rows, "next_cursor": next_cursor}
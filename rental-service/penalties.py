@@ -0,0 +1,146 @@
+import asyncio
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import bindparam, tuple_, update
+
+import models
+from database import SessionLocal
+
+# --------------------------
+# CONFIG
+# --------------------------
+
+# a rental running longer than this is overdue and accrues a penalty per started hour
+RENTAL_MAX_MINUTES = int(os.getenv("RENTAL_MAX_MINUTES", str(24 * 60)))
+PENALTY_EUR_PER_HOUR = float(os.getenv("PENALTY_EUR_PER_HOUR", "5"))
+
+PENALTY_SWEEP_INTERVAL = float(os.getenv("PENALTY_SWEEP_INTERVAL", "60"))
+PENALTY_SWEEP_BATCH_SIZE = int(os.getenv("PENALTY_SWEEP_BATCH_SIZE", "500"))
+
+
+def penalty_for(start: datetime, end: datetime) -> float:
+    overdue_minutes = (end - start).total_seconds() / 60 - RENTAL_MAX_MINUTES
+    if overdue_minutes <= 0:
+        return 0.0
+    return math.ceil(overdue_minutes / 60) * PENALTY_EUR_PER_HOUR
+
+
+# --------------------------
+# SWEEPER
+# --------------------------
+
+class PenaltySweeper:
+    """Periodically writes the accrued penalty of overdue active rentals.
+
+    Only active rentals that started before the overdue cutoff are read,
+    in keyset batches over ix_rentals_status_start_time, so a sweep costs
+    the overdue rentals rather than the table. A row is written only when
+    its penalty went up. The return path settles the final penalty itself.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self.sweeps = 0
+        self.scanned = 0
+        self.flagged = 0
+        self.last_sweep_seconds: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep_once)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # DB hiccup; the next sweep recomputes everything anyway
+                pass
+            await asyncio.sleep(PENALTY_SWEEP_INTERVAL)
+
+    def sweep_once(self, now: Optional[datetime] = None) -> int:
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(minutes=RENTAL_MAX_MINUTES)
+        started = time.perf_counter()
+        flagged = 0
+        after = None
+
+        rentals = models.Rental.__table__
+        stmt = (
+            update(rentals)
+            .where(rentals.c.id == bindparam("rental_id"))
+            # a rental returned meanwhile keeps the penalty settled at return
+            .where(rentals.c.status == "active")
+            .values(penalty_eur=bindparam("penalty"))
+        )
+
+        db = self.session_factory()
+        try:
+            while True:
+                query = db.query(
+                    models.Rental.id,
+                    models.Rental.start_time,
+                    models.Rental.penalty_eur,
+                ).filter(
+                    models.Rental.status == "active",
+                    models.Rental.start_time < cutoff,
+                )
+                if after is not None:
+                    query = query.filter(
+                        tuple_(models.Rental.start_time, models.Rental.id) > after
+                    )
+                rows = query.order_by(
+                    models.Rental.start_time,
+                    models.Rental.id,
+                ).limit(PENALTY_SWEEP_BATCH_SIZE).all()
+                if not rows:
+                    break
+
+                changes = []
+                for rental_id, start_time, current in rows:
+                    penalty = penalty_for(start_time, now)
+                    if penalty > (current or 0.0):
+                        changes.append({"rental_id": rental_id, "penalty": penalty})
+
+                if changes:
+                    db.execute(stmt, changes)
+                    db.commit()
+                    flagged += len(changes)
+
+                self.scanned += len(rows)
+                after = (rows[-1][1], rows[-1][0])
+                if len(rows) < PENALTY_SWEEP_BATCH_SIZE:
+                    break
+        finally:
+            db.close()
+
+        self.sweeps += 1
+        self.flagged += flagged
+        self.last_sweep_seconds = time.perf_counter() - started
+        return flagged
+
+    def stats(self) -> dict:
+        return {
+            "sweeps": self.sweeps,
+            "scanned": self.scanned,
+            "flagged": self.flagged,
+            "last_sweep_seconds": self.last_sweep_seconds,
+        }
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+# --------------------------
+# CONFIG
+# --------------------------
+
+RATE_CACHE_TTL = float(os.getenv("RATE_CACHE_TTL", "3600"))
+RATE_CACHE_SIZE = int(os.getenv("RATE_CACHE_SIZE", "1024"))
+
+
+# --------------------------
+# CACHE
+# --------------------------
+
+class RateCache:
+    """In-process hourly-rate cache with TTL, LRU eviction and single-flight loads."""
+
+    def __init__(self, maxsize: int = RATE_CACHE_SIZE, ttl: float = RATE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[float, float]]" = OrderedDict()
+        self._inflight: Dict[int, asyncio.Future] = {}
+        # bumped on invalidation so a load started earlier cannot store a stale rate
+        self._versions: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def peek(self, equipment_id: int) -> Optional[float]:
+        entry = self._entries.get(equipment_id)
+        if entry is None:
+            return None
+
+        rate, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[equipment_id]
+            return None
+
+        self._entries.move_to_end(equipment_id)
+        return rate
+
+    def put(self, equipment_id: int, rate: float) -> None:
+        self._entries[equipment_id] = (rate, time.monotonic() + self.ttl)
+        self._entries.move_to_end(equipment_id)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, equipment_id: Optional[int] = None) -> None:
+        if equipment_id is None:
+            self._entries.clear()
+            self._versions.clear()
+            return
+
+        self._entries.pop(equipment_id, None)
+        self._versions[equipment_id] = self._versions.get(equipment_id, 0) + 1
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    async def get(
+        self,
+        equipment_id: int,
+        loader: Callable[[int], Awaitable[float]],
+    ) -> float:
+        rate = self.peek(equipment_id)
+        if rate is not None:
+            self.hits += 1
+            return rate
+
+        self.misses += 1
+
+        pending = self._inflight.get(equipment_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[equipment_id] = future
+        version = self._versions.get(equipment_id, 0)
+
+        try:
+            rate = await loader(equipment_id)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # waiters re-raise it; mark retrieved so a lone caller does not warn
+            future.exception()
+            raise
+        else:
+            if self._versions.get(equipment_id, 0) == version:
+                self.put(equipment_id, rate)
+            future.set_result(rate)
+            return rate
+        finally:
+            self._inflight.pop(equipment_id, None)
+
+
+rate_cache = RateCache()
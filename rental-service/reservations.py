@@ -0,0 +1,426 @@
+import asyncio
+import os
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import httpx
+
+import models
+from database import SessionLocal
+from inventory_client import InventoryClient
+
+# --------------------------
+# CONFIG
+# --------------------------
+
+RESERVATION_MIN_MINUTES = int(os.getenv("RESERVATION_MIN_MINUTES", "15"))
+RESERVATION_MAX_MINUTES = int(os.getenv("RESERVATION_MAX_MINUTES", str(7 * 24 * 60)))
+RESERVATION_HORIZON_DAYS = int(os.getenv("RESERVATION_HORIZON_DAYS", "60"))
+# a walk-in rental is expected to last this long; it is refused if a booking starts within it
+RESERVATION_WALK_IN_MINUTES = int(os.getenv("RESERVATION_WALK_IN_MINUTES", "60"))
+
+RESERVATION_POLL_INTERVAL = float(os.getenv("RESERVATION_POLL_INTERVAL", "15"))
+RESERVATION_BATCH_SIZE = int(os.getenv("RESERVATION_BATCH_SIZE", "100"))
+
+BOOKED = "booked"
+CONVERTED = "converted"
+CANCELLED = "cancelled"
+EXPIRED = "expired"
+FAILED = "failed"
+
+# statuses that hold their slot in the index
+HOLDING = (BOOKED, CONVERTED)
+
+
+# --------------------------
+# INTERVAL INDEX
+# --------------------------
+
+class Schedule:
+    """One equipment's reserved intervals as parallel lists sorted by start.
+
+    Intervals never overlap (`add` is only called after `conflict`), so the
+    ends are sorted too and every lookup is a bisect on one of the lists.
+    Intervals are half-open: one may start exactly when another ends.
+    """
+
+    __slots__ = ("starts", "ends", "ids")
+
+    def __init__(self):
+        self.starts: List[datetime] = []
+        self.ends: List[datetime] = []
+        self.ids: List[int] = []
+
+    def conflict(self, start: datetime, end: datetime) -> Optional[int]:
+        # of the intervals starting before `end`, the last one ends latest
+        i = bisect_left(self.starts, end)
+        if i and self.ends[i - 1] > start:
+            return self.ids[i - 1]
+        return None
+
+    def add(self, reservation_id: int, start: datetime, end: datetime) -> None:
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, reservation_id)
+
+    def remove(self, reservation_id: int, start: datetime) -> bool:
+        i = bisect_left(self.starts, start)
+        while i < len(self.starts) and self.starts[i] == start:
+            if self.ids[i] == reservation_id:
+                del self.starts[i], self.ends[i], self.ids[i]
+                return True
+            i += 1
+        return False
+
+    def free(self, start: datetime, end: datetime, min_length: timedelta) -> List[Tuple[datetime, datetime]]:
+        slots = []
+        cursor = start
+        i = bisect_right(self.ends, start)  # first interval still running at `start`
+        while i < len(self.starts) and self.starts[i] < end:
+            if self.starts[i] - cursor >= min_length:
+                slots.append((cursor, self.starts[i]))
+            cursor = max(cursor, self.ends[i])
+            i += 1
+        if end - cursor >= min_length:
+            slots.append((cursor, end))
+        return slots
+
+    def prune(self, before: datetime) -> int:
+        i = bisect_right(self.ends, before)
+        if i:
+            del self.starts[:i], self.ends[:i], self.ids[:i]
+        return i
+
+
+def subtract(
+    slots: List[Tuple[datetime, datetime]],
+    start: datetime,
+    end: datetime,
+    min_length: timedelta,
+) -> List[Tuple[datetime, datetime]]:
+    """`slots` minus the interval [start, end), dropping pieces shorter than `min_length`."""
+    kept = []
+    for a, b in slots:
+        for piece in ((a, min(b, start)), (max(a, end), b)):
+            if piece[1] - piece[0] >= min_length:
+                kept.append(piece)
+    return kept
+
+
+class ReservationIndex:
+    """In-memory schedules of booked and converted reservations per equipment.
+
+    The source of truth for overlap checks: a slot is claimed here before
+    the row is inserted, all on the event loop, so two requests cannot both
+    book it. Like the other in-process caches it assumes one worker process.
+    Loaded at startup; intervals that have ended are pruned by the converter.
+
+    It also knows which equipment is out on an active rental. Such a rental
+    has no end yet, so it occupies [start, now + RESERVATION_MIN_MINUTES).
+    """
+
+    def __init__(self):
+        self._schedules: Dict[int, Schedule] = {}
+        self._open: Dict[int, datetime] = {}
+        self.checks = 0
+        self.conflicts = 0
+
+    def conflict(self, equipment_id: int, start: datetime, end: datetime) -> Optional[int]:
+        self.checks += 1
+        schedule = self._schedules.get(equipment_id)
+        found = schedule.conflict(start, end) if schedule is not None else None
+        if found is not None:
+            self.conflicts += 1
+        return found
+
+    def add(self, equipment_id: int, reservation_id: int, start: datetime, end: datetime) -> None:
+        self._schedules.setdefault(equipment_id, Schedule()).add(reservation_id, start, end)
+
+    def remove(self, equipment_id: int, reservation_id: int, start: datetime) -> None:
+        schedule = self._schedules.get(equipment_id)
+        if schedule is not None and schedule.remove(reservation_id, start) and not schedule.ids:
+            del self._schedules[equipment_id]
+
+    def open_rental(self, equipment_id: int, start: datetime) -> bool:
+        """Record an active rental; False if the equipment already has one."""
+        if equipment_id in self._open:
+            return False
+        self._open[equipment_id] = start
+        return True
+
+    def close_rental(self, equipment_id: int) -> None:
+        self._open.pop(equipment_id, None)
+
+    def _rented_interval(self, equipment_id: int) -> Optional[Tuple[datetime, datetime]]:
+        start = self._open.get(equipment_id)
+        if start is None:
+            return None
+        return start, datetime.utcnow() + timedelta(minutes=RESERVATION_MIN_MINUTES)
+
+    def rented(self, equipment_id: int, start: datetime, end: datetime) -> bool:
+        interval = self._rented_interval(equipment_id)
+        return interval is not None and interval[0] < end and interval[1] > start
+
+    def free(
+        self,
+        equipment_id: int,
+        start: datetime,
+        end: datetime,
+        min_length: timedelta = timedelta(),
+    ) -> List[Tuple[datetime, datetime]]:
+        schedule = self._schedules.get(equipment_id) or Schedule()
+        slots = schedule.free(start, end, min_length)
+        interval = self._rented_interval(equipment_id)
+        if interval is not None:
+            slots = subtract(slots, interval[0], interval[1], min_length)
+        return slots
+
+    def prune(self, before: datetime) -> int:
+        pruned = 0
+        for equipment_id in list(self._schedules):
+            schedule = self._schedules[equipment_id]
+            pruned += schedule.prune(before)
+            if not schedule.ids:
+                del self._schedules[equipment_id]
+        return pruned
+
+    def load(self, rows: Iterable, rentals: Iterable = ()) -> None:
+        self._schedules.clear()
+        self._open.clear()
+        for row in rows:
+            self.add(row.equipment_id, row.id, row.start_time, row.end_time)
+        for row in rentals:
+            self.open_rental(row.equipment_id, row.start_time)
+
+    def stats(self) -> dict:
+        return {
+            "equipment": len(self._schedules),
+            "intervals": sum(len(s.ids) for s in self._schedules.values()),
+            "open_rentals": len(self._open),
+            "checks": self.checks,
+            "conflicts": self.conflicts,
+        }
+
+
+def load_reservation_rows(session_factory=SessionLocal) -> list:
+    db = session_factory()
+    try:
+        return db.query(
+            models.Reservation.id,
+            models.Reservation.equipment_id,
+            models.Reservation.start_time,
+            models.Reservation.end_time,
+        ).filter(
+            models.Reservation.status.in_(HOLDING),
+            models.Reservation.end_time > datetime.utcnow(),
+        ).order_by(
+            models.Reservation.equipment_id,
+            models.Reservation.start_time,
+        ).all()
+    finally:
+        db.close()
+
+
+def load_open_rental_rows(session_factory=SessionLocal) -> list:
+    db = session_factory()
+    try:
+        return db.query(
+            models.Rental.equipment_id,
+            models.Rental.start_time,
+        ).filter(
+            models.Rental.status == "active",
+        ).all()
+    finally:
+        db.close()
+
+
+# --------------------------
+# CONVERTER
+# --------------------------
+
+class ReservationConverter:
+    """Turns booked reservations into rentals once their start time arrives.
+
+    Reserves the equipment in inventory with the service identity, then
+    inserts the Rental and marks the reservation converted in one commit.
+    Equipment that is gone fails the reservation. Equipment that is busy,
+    or an unreachable inventory, leaves it booked for the next poll; if its
+    slot passes without a conversion it fails (inventory kept refusing) or
+    expires (inventory never answered).
+    """
+
+    def __init__(
+        self,
+        client: InventoryClient,
+        token_provider: Callable[[], str],
+        index: ReservationIndex,
+        session_factory=SessionLocal,
+    ):
+        self.client = client
+        self.token_provider = token_provider
+        self.index = index
+        self.session_factory = session_factory
+        self.converted = 0
+        self.failed = 0
+        self.expired = 0
+        # booked reservations the inventory last refused with a 409
+        self._refused: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                handled = await self.convert_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # DB hiccup; due reservations are still booked next time
+                handled = 0
+
+            if handled < RESERVATION_BATCH_SIZE:
+                self.index.prune(datetime.utcnow())
+                await asyncio.sleep(RESERVATION_POLL_INTERVAL)
+
+    async def convert_due(self) -> int:
+        now = datetime.utcnow()
+        due, expired, failed = await asyncio.to_thread(self._claim_due, now, frozenset(self._refused))
+        for reservation in expired + failed:
+            self.index.remove(reservation.equipment_id, reservation.id, reservation.start_time)
+            self._refused.discard(reservation.id)
+        self.expired += len(expired)
+        self.failed += len(failed)
+
+        settled = len(expired) + len(failed)
+        if due:
+            token = self.token_provider()
+            for reservation in due:
+                settled += await self._convert(reservation, token)
+        # only settled ones count, so an unreachable inventory does not spin the loop
+        return settled
+
+    def _claim_due(
+        self, now: datetime, refused: Iterable[int]
+    ) -> Tuple[List[models.Reservation], List[models.Reservation], List[models.Reservation]]:
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(models.Reservation)
+                .filter(models.Reservation.status == BOOKED)
+                .filter(models.Reservation.start_time <= now)
+                .order_by(models.Reservation.start_time)
+                .limit(RESERVATION_BATCH_SIZE)
+                .all()
+            )
+            # never picked up while its slot lasted: failed if the equipment
+            # stayed busy, expired if the inventory was down for that long
+            refused = set(refused)
+            over = [r for r in rows if r.end_time <= now]
+            failed = [r for r in over if r.id in refused]
+            expired = [r for r in over if r.id not in refused]
+            for status, settled in ((FAILED, failed), (EXPIRED, expired)):
+                if settled:
+                    db.query(models.Reservation).filter(
+                        models.Reservation.id.in_([r.id for r in settled]),
+                        models.Reservation.status == BOOKED,
+                    ).update({"status": status}, synchronize_session=False)
+            if over:
+                db.commit()
+            db.expunge_all()
+        finally:
+            db.close()
+
+        return [r for r in rows if r.end_time > now], expired, failed
+
+    async def _convert(self, reservation: models.Reservation, token: str) -> bool:
+        try:
+            resp = await self.client.reserve_equipment(reservation.equipment_id, token)
+        except httpx.HTTPError:
+            return False
+
+        if resp.status_code == 409:
+            # still rented out or in maintenance; try again until the slot has passed
+            self._refused.add(reservation.id)
+            return False
+        self._refused.discard(reservation.id)
+        if resp.status_code == 404:
+            await asyncio.to_thread(self._finish, reservation, FAILED, None)
+            self.index.remove(reservation.equipment_id, reservation.id, reservation.start_time)
+            self.failed += 1
+            return True
+        if resp.status_code != 200:
+            return False
+
+        held = resp.json()
+        try:
+            recorded = await asyncio.to_thread(self._finish, reservation, CONVERTED, held)
+        except Exception:
+            recorded = False
+        if recorded:
+            self.index.open_rental(reservation.equipment_id, datetime.utcnow())
+            self.converted += 1
+            return True
+
+        # cancelled meanwhile, or the insert failed: hand the bike back
+        try:
+            await self.client.release_equipment(reservation.equipment_id, token)
+        except httpx.HTTPError:
+            pass
+        return False
+
+    def _finish(self, reservation: models.Reservation, status: str, held: Optional[dict]) -> bool:
+        db = self.session_factory()
+        try:
+            values = {"status": status}
+            if held is not None:
+                rental = models.Rental(
+                    user_id=reservation.user_id,
+                    equipment_id=reservation.equipment_id,
+                    start_time=datetime.utcnow(),
+                    status="active",
+                    hourly_rate=float(held["hourly_rate"]),
+                    equipment_type=held.get("type"),
+                )
+                db.add(rental)
+                db.flush()
+                values["rental_id"] = rental.id
+
+            # conditional, so a reservation cancelled in between stays cancelled
+            updated = db.query(models.Reservation).filter(
+                models.Reservation.id == reservation.id,
+                models.Reservation.status == BOOKED,
+            ).update(values, synchronize_session=False)
+            if not updated:
+                db.rollback()
+                return False
+
+            db.commit()
+            return True
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            "converted": self.converted,
+            "failed": self.failed,
+            "expired": self.expired,
+        }
+
+
+reservation_index = ReservationIndex()
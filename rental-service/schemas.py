@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
 from pydantic import BaseModel, ConfigDict
 
@@ -47,6 +47,8 @@ class RentalInDBBase(BaseModel):
     total_minutes: Optional[int] = None
     total_price: Optional[float] = None
     penalty_eur: float
+    hourly_rate: Optional[float] = None
+    equipment_type: Optional[str] = None
 
 
 # ==========================
@@ -64,3 +66,141 @@ class Rental(RentalInDBBase):
 class RentalList(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     items: List[Rental]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
+
+
+# ==========================
+# ACTIVE RENTALS
+# ==========================
+
+class ActiveRental(Rental):
+    current_minutes: int
+    current_price: Optional[float] = None  # cost if returned now, before penalties; None without a known rate
+    projected_penalty_eur: float
+
+
+class ActiveRentalList(BaseModel):
+    as_of: datetime
+    items: List[ActiveRental]
+    total_eur: float  # current_price plus projected_penalty_eur over all items
+
+
+# ==========================
+# RESERVATIONS
+# ==========================
+
+class ReservationCreate(BaseModel):
+    equipment_id: int
+    start_time: datetime
+    end_time: datetime
+
+
+class Reservation(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    user_id: int
+    equipment_id: int
+    start_time: datetime
+    end_time: datetime
+    status: str
+    rental_id: Optional[int] = None
+    created_at: datetime
+
+
+class FreeSlot(BaseModel):
+    start_time: datetime
+    end_time: datetime
+
+
+class FreeSlots(BaseModel):
+    equipment_id: int
+    slots: List[FreeSlot]
+
+
+# ==========================
+# ENRICHED VIEW
+# ==========================
+
+class EquipmentSummary(BaseModel):
+    id: int
+    type: str
+    status: str
+    location: str
+    hourly_rate: float
+    image_url: Optional[str] = None
+
+
+class UserSummary(BaseModel):
+    id: int
+    name: str
+    email: str
+    role: str
+
+
+class EnrichedRental(Rental):
+    equipment: Optional[EquipmentSummary] = None  # None when inventory no longer knows the id
+    user: Optional[UserSummary] = None
+
+
+class EnrichedRentalList(BaseModel):
+    items: List[EnrichedRental]
+    next_cursor: Optional[str] = None
+
+
+# ==========================
+# RATE CACHE INVALIDATION
+# ==========================
+
+class RateInvalidation(BaseModel):
+    equipment_id: Optional[int] = None  # None drops every cached rate
+    hourly_rate: Optional[float] = None  # known new rate, primes the cache
+
+
+# ==========================
+# OUTBOX MONITORING
+# ==========================
+
+class OutboxStats(BaseModel):
+    depth: int
+    dead: int
+    oldest_pending_age_seconds: float
+    last_dispatch_lag_seconds: Optional[float] = None
+    dispatched_total: int
+    failed_total: int
+
+
+# ==========================
+# ANALYTICS
+# ==========================
+
+class RevenueRow(BaseModel):
+    key: str  # day, equipment id or equipment type, depending on group_by
+    rentals: int
+    minutes: int
+    revenue: float
+
+
+class EquipmentUtilization(BaseModel):
+    equipment_id: int
+    rented_minutes: int
+    utilization_pct: float
+
+
+class Utilization(BaseModel):
+    date_from: date
+    date_to: date
+    period_minutes: int
+    fleet_size: int
+    rented_minutes: int
+    utilization_pct: float
+    per_equipment: List[EquipmentUtilization]
+
+
+class PeakHour(BaseModel):
+    hour: int
+    rentals: int
+
+
+class RollupRebuild(BaseModel):
+    rows: int
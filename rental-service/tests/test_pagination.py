@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import models
+from database import Base
+from pagination import filter_rentals, naive_utc
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[models.Rental.__table__])
+    with Session(engine) as s:
+        for hour in (7, 8, 9):
+            s.add(models.Rental(user_id=1, equipment_id=hour, start_time=datetime(2026, 5, 1, hour)))
+        s.commit()
+        yield s
+
+
+def started(query):
+    return sorted(r.start_time.hour for r in query.all())
+
+
+def test_naive_utc_converts_offsets_and_keeps_naive_values():
+    aware = datetime(2026, 5, 1, 10, 30, tzinfo=timezone(timedelta(hours=2)))
+    assert naive_utc(aware) == datetime(2026, 5, 1, 8, 30)
+    assert naive_utc(datetime(2026, 5, 1, 8, 30)) == datetime(2026, 5, 1, 8, 30)
+
+
+def test_filter_rentals_converts_offset_bearing_bounds(session):
+    plus_two = timezone(timedelta(hours=2))
+    query = filter_rentals(
+        session.query(models.Rental),
+        start_from=datetime(2026, 5, 1, 10, 0, tzinfo=plus_two),  # 08:00 UTC
+        start_to=datetime(2026, 5, 1, 11, 0, tzinfo=plus_two),    # 09:00 UTC
+    )
+    assert started(query) == [8]
+
+
+def test_filter_rentals_naive_bounds_are_utc(session):
+    query = filter_rentals(session.query(models.Rental), start_from=datetime(2026, 5, 1, 8))
+    assert started(query) == [8, 9]